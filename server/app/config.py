@@ -1,8 +1,17 @@
+from functools import lru_cache
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings
 from typing import Optional
 from pathlib import Path
 
 
+class PayerPolicy(BaseModel):
+    """Quota overrides for one payer; unset fields fall back to the gateway-wide defaults"""
+    daily_spend_limit_usd: Optional[float] = None
+    monthly_spend_limit_usd: Optional[float] = None
+    allowed_models: Optional[list[str]] = None
+
+
 class Settings(BaseSettings):
     # API Keys
     openai_api_key: str
@@ -31,10 +40,51 @@ class Settings(BaseSettings):
 
     # Performance
     max_concurrent_requests: int = 1000
+    upstream_max_connections: int = 100  # Connection pool size per worker
+    upstream_timeout_seconds: float = 120.0  # Total per request, per read when streaming
+    batch_max_requests: int = 1000  # Requests accepted in one /v1/batch call
+    batch_max_concurrency: int = 16  # Upstream calls in flight per /v1/batch call
+
+    # Per-payer quotas, checked before the facilitator is called (None disables a limit)
+    payer_daily_spend_limit_usd: Optional[float] = None  # Per payer, per UTC day
+    payer_monthly_spend_limit_usd: Optional[float] = None  # Per payer, per UTC month
+    payer_allowed_models: Optional[list[str]] = None  # Models or model families payers may use (JSON list), None allows all
+    payer_policies: dict[str, PayerPolicy] = {}  # Per-payer overrides keyed by address (JSON object)
+
+    # Tracing (OpenTelemetry, exported over OTLP/HTTP)
+    tracing_enabled: bool = False
+    tracing_otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    tracing_service_name: str = "x402-ai-gateway"
+    tracing_sample_ratio: float = 0.01  # Head sampling: fraction of traces always exported
+    tracing_tail_latency_ms: Optional[float] = 2000.0  # Tail sampling: also export slower or failed traces (None disables)
+
+    # Health checks
+    health_probe_interval_seconds: float = 10.0  # Dependency probes run in the background
+    health_probe_timeout_seconds: float = 2.0
+    health_max_event_loop_lag_ms: float = 250.0  # Above this the worker reports not ready
+    health_max_pool_saturation: float = 0.9  # Upstream pool usage (0-1) above which the worker reports not ready
+    health_counters_token: Optional[str] = None  # Bearer token for /health/counters (None disables the endpoint)
+
+    # Deployment
+    workers: int = 1  # Worker processes started by `python main.py`
+    shared_state_backend: str = "memory"  # memory (per worker) or redis (shared across workers)
+    shared_state_sync_interval_seconds: float = 1.0
 
     # Development
     dev_mode: bool = False  # Controls pricing, network (testnet/mainnet), and OpenAI mocking
 
+    # Mock upstream (only used in dev_mode)
+    mock_latency_distribution: str = "none"  # none, fixed, uniform, normal, lognormal, exponential
+    mock_latency_ms: float = 0.0  # Mean time to first byte
+    mock_latency_stddev_ms: float = 0.0
+    mock_input_tokens: Optional[int] = None  # If None, use the fixture's usage
+    mock_output_tokens: Optional[int] = None  # If None, use the fixture's usage
+    mock_stream_chunks: int = 16  # Text deltas per streamed response
+    mock_stream_chunk_interval_ms: float = 0.0
+    mock_error_rate: float = 0.0  # Fraction of requests that fail (0-1)
+    mock_error_status: int = 500
+    mock_seed: Optional[int] = None  # Seed for reproducible latency/error sampling
+
     class Config:
         env_file = Path(__file__).parents[1] / ".env"
         case_sensitive = False
@@ -58,4 +108,7 @@ class Settings(BaseSettings):
         return self.dev_mode
 
 
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    """Load the settings on first use instead of at import time"""
+    return Settings()
@@ -1,3 +1,10 @@
 from app.cost.pricing_engine import PricingEngine
+from app.cost.request_analyzer import (
+    RequestAnalysis,
+    UsageAnalysis,
+    analyze_batch,
+    analyze_request,
+    analyze_usage,
+)
 
-__all__ = ["PricingEngine"]
+__all__ = ["PricingEngine", "RequestAnalysis", "UsageAnalysis", "analyze_batch", "analyze_request", "analyze_usage"]
@@ -1,26 +1,54 @@
-from typing import Dict
+from functools import lru_cache
+from typing import Dict, Optional
 from decimal import Decimal
 
 # Model pricing (per 1000 tokens) - Last updated: January 2025
 # Source: https://openai.com/api/pricing/
+# `cached_input` applies to input tokens served from the prompt cache
 MODEL_PRICING = {
     # GPT-4o family
-    "gpt-4o": {"input": Decimal("0.006"), "output": Decimal("0.018")},
-    "gpt-4o-mini": {"input": Decimal("0.00015"), "output": Decimal("0.0006")},
+    "gpt-4o": {"input": Decimal("0.006"), "cached_input": Decimal("0.003"), "output": Decimal("0.018")},
+    "gpt-4o-mini": {"input": Decimal("0.00015"), "cached_input": Decimal("0.000075"), "output": Decimal("0.0006")},
 
-    # GPT-4 family
-    "gpt-4-turbo": {"input": Decimal("0.01"), "output": Decimal("0.03")},
-    "gpt-4": {"input": Decimal("0.03"), "output": Decimal("0.06")},
+    # GPT-4 family (no prompt caching discount)
+    "gpt-4-turbo": {"input": Decimal("0.01"), "cached_input": Decimal("0.01"), "output": Decimal("0.03")},
+    "gpt-4": {"input": Decimal("0.03"), "cached_input": Decimal("0.03"), "output": Decimal("0.06")},
 
-    # GPT-3.5 family
-    "gpt-3.5-turbo": {"input": Decimal("0.0005"), "output": Decimal("0.0015")},
+    # GPT-3.5 family (no prompt caching discount)
+    "gpt-3.5-turbo": {"input": Decimal("0.0005"), "cached_input": Decimal("0.0005"), "output": Decimal("0.0015")},
 
     # o1 reasoning models
-    "o1": {"input": Decimal("0.15"), "output": Decimal("0.6")},
-    "o1-preview": {"input": Decimal("0.015"), "output": Decimal("0.06")},
-    "o1-mini": {"input": Decimal("0.003"), "output": Decimal("0.012")},
+    "o1": {"input": Decimal("0.15"), "cached_input": Decimal("0.075"), "output": Decimal("0.6")},
+    "o1-preview": {"input": Decimal("0.015"), "cached_input": Decimal("0.0075"), "output": Decimal("0.06")},
+    "o1-mini": {"input": Decimal("0.003"), "cached_input": Decimal("0.0015"), "output": Decimal("0.012")},
 }
 
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+
+@lru_cache(maxsize=1024)
+def model_family(model: str) -> Optional[str]:
+    """
+    Get the MODEL_PRICING key of a model, or None for an unknown model.
+
+    Dated snapshots (e.g. `gpt-4o-2024-08-06`) resolve to their family by
+    longest prefix.
+    """
+    if model in MODEL_PRICING:
+        return model
+    matches = [name for name in MODEL_PRICING if model.startswith(f"{name}-")]
+    return max(matches, key=len) if matches else None
+
+
+def resolve_model(model: str) -> str:
+    """
+    Map a model name to its MODEL_PRICING key.
+
+    Unknown models are priced as DEFAULT_MODEL, so this must not be used to
+    decide which model a request actually uses (see `model_family`).
+    """
+    return model_family(model) or DEFAULT_MODEL
+
 # Dev mode price divisor (makes prices 1 millionth of production)
 DEV_MODE_DIVISOR = Decimal("1000000")  # 10^6
 
@@ -36,18 +64,15 @@ class PricingEngine:
         self.dev_mode = dev_mode
         self._price_multiplier = Decimal("1") / DEV_MODE_DIVISOR if dev_mode else Decimal("1")
 
+        # Rates adjusted for dev mode, computed once instead of per request
+        self._rates = {
+            model: {kind: rate * self._price_multiplier for kind, rate in rates.items()}
+            for model, rates in MODEL_PRICING.items()
+        }
+
     def _get_rates(self, model: str) -> Dict[str, Decimal]:
         """Get pricing rates for a model, adjusted for dev mode"""
-        if model not in MODEL_PRICING:
-            model = "gpt-3.5-turbo"  # Default fallback
-
-        rates = MODEL_PRICING[model]
-        if self.dev_mode:
-            return {
-                "input": rates["input"] * self._price_multiplier,
-                "output": rates["output"] * self._price_multiplier
-            }
-        return rates
+        return self._rates[resolve_model(model)]
 
     def estimate_cost(self, model: str, input_tokens: int, max_output_tokens: int) -> Decimal:
         """
@@ -61,10 +86,17 @@ class PricingEngine:
         return input_cost + output_cost
 
     def calculate_actual_cost(self, model: str, input_tokens: int,
-                             output_tokens: int) -> Decimal:
-        """Calculate actual cost after inference."""
+                             output_tokens: int, cached_input_tokens: int = 0) -> Decimal:
+        """
+        Calculate actual cost after inference.
+
+        `cached_input_tokens` is the part of `input_tokens` served from the
+        prompt cache and billed at the cached input rate.
+        """
         rates = self._get_rates(model)
-        input_cost = (Decimal(input_tokens) / 1000) * rates["input"]
+        cached_input_tokens = min(cached_input_tokens, input_tokens)
+        input_cost = (Decimal(input_tokens - cached_input_tokens) / 1000) * rates["input"]
+        input_cost += (Decimal(cached_input_tokens) / 1000) * rates["cached_input"]
         output_cost = (Decimal(output_tokens) / 1000) * rates["output"]
 
         return input_cost + output_cost
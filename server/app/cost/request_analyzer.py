@@ -0,0 +1,301 @@
+from typing import NamedTuple, Optional
+
+from app.cost.pricing_engine import resolve_model
+from app.cost.token_counter import count_tokens
+from app.serialization import dumps
+
+# Per-model constants, so a request is analyzed without calling the API
+#   context_window: input plus output tokens the model accepts
+#   max_output_tokens: hard limit of the model, requested values are clamped to it
+#   default_output_tokens: cap applied (and forwarded) when the request sets none
+#   image_tokens_low / image_tokens_high: cost of one image at `detail: low`,
+#       and the worst case at `high` / `auto` (largest tiling of a 2048x768 image)
+MODEL_PROFILES = {
+    "gpt-4o": {"context_window": 128000, "max_output_tokens": 16384, "default_output_tokens": 1000, "image_tokens_low": 85, "image_tokens_high": 1445},
+    "gpt-4o-mini": {"context_window": 128000, "max_output_tokens": 16384, "default_output_tokens": 1000, "image_tokens_low": 2833, "image_tokens_high": 48169},
+    "gpt-4-turbo": {"context_window": 128000, "max_output_tokens": 4096, "default_output_tokens": 1000, "image_tokens_low": 85, "image_tokens_high": 1445},
+    "gpt-4": {"context_window": 8192, "max_output_tokens": 8192, "default_output_tokens": 1000, "image_tokens_low": 85, "image_tokens_high": 1445},
+    "gpt-3.5-turbo": {"context_window": 16385, "max_output_tokens": 4096, "default_output_tokens": 1000, "image_tokens_low": 85, "image_tokens_high": 1445},
+    # Reasoning tokens count towards max_output_tokens, so the default leaves room for them
+    "o1": {"context_window": 200000, "max_output_tokens": 100000, "default_output_tokens": 4096, "image_tokens_low": 75, "image_tokens_high": 1275},
+    "o1-preview": {"context_window": 128000, "max_output_tokens": 32768, "default_output_tokens": 4096, "image_tokens_low": 75, "image_tokens_high": 1275},
+    "o1-mini": {"context_window": 128000, "max_output_tokens": 65536, "default_output_tokens": 4096, "image_tokens_low": 75, "image_tokens_high": 1275},
+}
+
+# Formatting overheads, see OpenAI's token counting cookbook
+TOKENS_PER_MESSAGE = 3  # <|start|>{role}\n{content}<|end|>\n
+TOKENS_PER_REPLY = 3  # Every reply is primed with <|start|>assistant<|message|>
+TOKENS_PER_TOOLS = 12  # Tool namespace preamble, once per request
+TOKENS_PER_TOOL = 8  # Per tool definition, on top of its JSON
+
+# Rough size of a base64 file (e.g. PDF) in tokens: 4 bytes of text per token
+FILE_BYTES_PER_TOKEN = 4
+
+
+class RequestAnalysis(NamedTuple):
+    """Token breakdown of a Responses API request, used for the escrow"""
+    model: str  # Requested model
+    pricing_model: str  # MODEL_PRICING key the request is priced as
+    input_tokens: int  # Total input tokens, including the parts below
+    instructions_tokens: int
+    tool_tokens: int
+    image_count: int
+    image_tokens: int
+    referenced_file_count: int  # Files given by `file_id` / `file_url`, whose size is unknown here
+    max_output_tokens: int  # Output (including reasoning) tokens the escrow covers
+    output_tokens_capped: bool  # True if the request set no limit and the default applies
+    has_previous_response: bool  # Prior turns referenced by ID are billed but not visible here
+
+
+class UsageAnalysis(NamedTuple):
+    """Billed token usage of a Responses API response"""
+    input_tokens: int
+    cached_input_tokens: int
+    output_tokens: int  # Includes reasoning tokens
+    reasoning_tokens: int
+
+
+def get_profile(pricing_model: str) -> dict:
+    return MODEL_PROFILES.get(pricing_model) or MODEL_PROFILES["gpt-3.5-turbo"]
+
+
+def _image_tokens(part: dict, profile: dict) -> int:
+    if part.get("detail") == "low":
+        return profile["image_tokens_low"]
+    return profile["image_tokens_high"]
+
+
+def _file_tokens(file_data: str) -> int:
+    # `file_data` is a data URL or raw base64 string
+    encoded = file_data.split(",", 1)[-1]
+    return (len(encoded) * 3 // 4) // FILE_BYTES_PER_TOKEN
+
+
+class _Counter:
+    """Accumulates the token counts of one request"""
+
+    def __init__(self, model: str, profile: dict):
+        self.model = model
+        self.profile = profile
+        self.tokens = 0
+        self.image_count = 0
+        self.image_tokens = 0
+        self.referenced_file_count = 0
+
+    def text(self, text) -> int:
+        if not text:
+            return 0
+        tokens = count_tokens(text if isinstance(text, str) else dumps(text).decode(), self.model)
+        self.tokens += tokens
+        return tokens
+
+    def content(self, content):
+        if isinstance(content, str):
+            self.text(content)
+            return
+
+        for part in content or []:
+            if not isinstance(part, dict):
+                self.text(part)
+                continue
+            part_type = part.get("type")
+            if part_type in ("input_text", "output_text", "text"):
+                self.text(part.get("text"))
+            elif part_type == "input_image":
+                tokens = _image_tokens(part, self.profile)
+                self.image_count += 1
+                self.image_tokens += tokens
+                self.tokens += tokens
+            elif part_type == "input_file":
+                if isinstance(part.get("file_data"), str):
+                    self.tokens += _file_tokens(part["file_data"])
+                else:
+                    self.referenced_file_count += 1
+            else:
+                self.text(part)
+
+    def item(self, item):
+        if not isinstance(item, dict):
+            self.text(item)
+            return
+
+        item_type = item.get("type", "message")
+        if item_type == "message":
+            self.tokens += TOKENS_PER_MESSAGE
+            self.text(item.get("role"))
+            self.content(item.get("content"))
+        elif item_type == "function_call":
+            self.tokens += TOKENS_PER_MESSAGE
+            self.text(item.get("name"))
+            self.text(item.get("arguments"))
+        elif item_type == "function_call_output":
+            self.tokens += TOKENS_PER_MESSAGE
+            self.text(item.get("output"))
+        else:
+            self.tokens += TOKENS_PER_MESSAGE
+            self.text(item)
+
+
+def analyze_request(body: dict) -> RequestAnalysis:
+    """
+    Estimate the billed tokens of a Responses API request.
+
+    Counts `instructions`, every `input` item (text, images, files, function
+    calls and their outputs), tool definitions and the structured output
+    schema. Output is bounded by `max_output_tokens`, clamped to the model's
+    limit, or the model's default cap when the request sets none.
+
+    Files given by `file_id` or `file_url` cannot be sized without fetching
+    them, so a request with such a file is escrowed as if its input filled
+    the model's context window, less the output it may produce. The refund,
+    calculated from the reported usage, accounts for what the file did not use.
+
+    Args:
+        body: The parsed request body
+
+    Returns:
+        RequestAnalysis of the request
+
+    Raises:
+        ValueError: If a field the estimate reads has the wrong type
+    """
+    if not isinstance(body, dict):
+        raise ValueError("The request body must be a JSON object")
+    model = body.get("model") or "gpt-3.5-turbo"
+    if not isinstance(model, str):
+        raise ValueError("`model` must be a string")
+    pricing_model = resolve_model(model)
+    profile = get_profile(pricing_model)
+    counter = _Counter(model, profile)
+
+    instructions_tokens = 0
+    if body.get("instructions"):
+        counter.tokens += TOKENS_PER_MESSAGE
+        instructions_tokens = counter.text(body["instructions"]) + TOKENS_PER_MESSAGE
+
+    input_data = body.get("input")
+    if isinstance(input_data, str):
+        counter.tokens += TOKENS_PER_MESSAGE
+        counter.text(input_data)
+    else:
+        for item in input_data or []:
+            counter.item(item)
+
+    tool_tokens = 0
+    tools = body.get("tools") or []
+    if not isinstance(tools, list):
+        raise ValueError("`tools` must be a list")
+    if tools:
+        tool_tokens = TOKENS_PER_TOOLS + TOKENS_PER_TOOL * len(tools)
+        counter.tokens += tool_tokens
+        for tool in tools:
+            tool_tokens += counter.text(tool)
+
+    text_config = body.get("text") or {}
+    if not isinstance(text_config, dict):
+        raise ValueError("`text` must be an object")
+    text_format = text_config.get("format") or {}
+    if not isinstance(text_format, dict):
+        raise ValueError("`text.format` must be an object")
+    if text_format.get("schema"):
+        counter.text(text_format["schema"])
+
+    counter.tokens += TOKENS_PER_REPLY
+
+    try:
+        requested_output_tokens = int(body["max_output_tokens"])
+    except (KeyError, TypeError, ValueError):
+        requested_output_tokens = None
+    if requested_output_tokens is None:
+        max_output_tokens = profile["default_output_tokens"]
+    else:
+        max_output_tokens = min(max(requested_output_tokens, 0), profile["max_output_tokens"])
+
+    input_tokens = counter.tokens
+    if counter.referenced_file_count:
+        input_tokens = max(input_tokens, profile["context_window"] - max_output_tokens)
+
+    return RequestAnalysis(
+        model=model,
+        pricing_model=pricing_model,
+        input_tokens=input_tokens,
+        instructions_tokens=instructions_tokens,
+        tool_tokens=tool_tokens,
+        image_count=counter.image_count,
+        image_tokens=counter.image_tokens,
+        referenced_file_count=counter.referenced_file_count,
+        max_output_tokens=max_output_tokens,
+        output_tokens_capped=requested_output_tokens is None,
+        has_previous_response=bool(body.get("previous_response_id")),
+    )
+
+
+def analyze_batch(body: dict, max_requests: int) -> list[RequestAnalysis]:
+    """
+    Analyze every request of a /v1/batch body in one pass.
+
+    The body is `{"requests": [{"custom_id": "...", "body": {...}}, ...]}`,
+    where each `body` is a Responses API request and `custom_id` is optional.
+
+    Args:
+        body: The parsed batch body
+        max_requests: Maximum number of requests in one batch
+
+    Returns:
+        RequestAnalysis of each request, in order
+
+    Raises:
+        ValueError: If the batch is empty, too large or malformed
+    """
+    if not isinstance(body, dict):
+        raise ValueError("The batch body must be a JSON object")
+    requests = body.get("requests")
+    if not isinstance(requests, list) or not requests:
+        raise ValueError("`requests` must be a non-empty list")
+    if len(requests) > max_requests:
+        raise ValueError(f"A batch holds at most {max_requests} requests, got {len(requests)}")
+
+    analyses = []
+    for index, item in enumerate(requests):
+        if not isinstance(item, dict) or not isinstance(item.get("body"), dict):
+            raise ValueError(f"requests[{index}].body must be a Responses API request object")
+        if item["body"].get("stream"):
+            raise ValueError(f"requests[{index}]: streaming is not supported in batches")
+        try:
+            analyses.append(analyze_request(item["body"]))
+        except ValueError as e:
+            raise ValueError(f"requests[{index}]: {e}")
+    return analyses
+
+
+def analyze_usage(usage: Optional[dict]) -> Optional[UsageAnalysis]:
+    """
+    Read the billed tokens from a response `usage` object.
+
+    Understands the Responses API schema (`input_tokens`, `output_tokens` and
+    their `*_details`), and the Chat Completions names as a fallback.
+
+    Returns:
+        UsageAnalysis, or None if the response carries no usage
+    """
+    if not usage:
+        return None
+
+    if "input_tokens" in usage or "output_tokens" in usage:
+        input_details = usage.get("input_tokens_details") or {}
+        output_details = usage.get("output_tokens_details") or {}
+        return UsageAnalysis(
+            input_tokens=usage.get("input_tokens") or 0,
+            cached_input_tokens=input_details.get("cached_tokens") or 0,
+            output_tokens=usage.get("output_tokens") or 0,
+            reasoning_tokens=output_details.get("reasoning_tokens") or 0,
+        )
+
+    prompt_details = usage.get("prompt_tokens_details") or {}
+    completion_details = usage.get("completion_tokens_details") or {}
+    return UsageAnalysis(
+        input_tokens=usage.get("prompt_tokens") or 0,
+        cached_input_tokens=prompt_details.get("cached_tokens") or 0,
+        output_tokens=usage.get("completion_tokens") or 0,
+        reasoning_tokens=completion_details.get("reasoning_tokens") or 0,
+    )
@@ -1,15 +1,24 @@
-import tiktoken
+from functools import lru_cache
 from typing import List, Dict
 
 
-def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
-    """Count tokens in a text string"""
+@lru_cache
+def get_encoding(model: str):
+    """Get the tiktoken encoding of a model (tiktoken is imported on first use)"""
+    import tiktoken
+
     try:
-        encoding = tiktoken.encoding_for_model(model)
+        return tiktoken.encoding_for_model(model)
     except KeyError:
-        encoding = tiktoken.get_encoding("cl100k_base")
+        return tiktoken.get_encoding("cl100k_base")
 
-    return len(encoding.encode(text))
+
+def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    """Count tokens in a text string"""
+    encoding = get_encoding(model)
+
+    # encode_ordinary treats special tokens in user text as plain text instead of raising
+    return len(encoding.encode_ordinary(text))
 
 
 def count_message_tokens(messages: List[Dict[str, str]], model: str = "gpt-3.5-turbo") -> int:
@@ -17,10 +26,7 @@ def count_message_tokens(messages: List[Dict[str, str]], model: str = "gpt-3.5-t
     Count tokens in a list of messages for chat completion.
     Based on OpenAI's token counting logic.
     """
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-    except KeyError:
-        encoding = tiktoken.get_encoding("cl100k_base")
+    encoding = get_encoding(model)
 
     tokens_per_message = 3  # every message follows <|start|>{role/name}\n{content}<|end|>\n
     tokens_per_name = 1  # if there's a name, the role is omitted
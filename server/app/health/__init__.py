@@ -0,0 +1,3 @@
+from app.health.monitor import DependencyProbe, HealthMonitor, get_health_monitor
+
+__all__ = ["DependencyProbe", "HealthMonitor", "get_health_monitor"]
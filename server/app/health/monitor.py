@@ -0,0 +1,198 @@
+import asyncio
+import time
+from functools import lru_cache
+from typing import Awaitable, Callable, Optional
+
+import structlog
+
+from app.config import get_settings
+
+logger = structlog.get_logger(__name__)
+
+ProbeCheck = Callable[[], Awaitable[Optional[str]]]
+
+
+class DependencyProbe:
+    """A named dependency check run in the background by HealthMonitor"""
+
+    def __init__(self, name: str, check: ProbeCheck, critical: bool = True):
+        """
+        Initialize a probe.
+
+        Args:
+            name: Dependency name reported in the health payload
+            check: Coroutine function that raises if the dependency is down.
+                It may return a string to mark the probe as skipped (e.g. mocked).
+            critical: Whether a failing probe makes the worker not ready
+        """
+        self.name = name
+        self.check = check
+        self.critical = critical
+        self.result = {"status": "unknown", "checked_at": None}
+
+
+class HealthMonitor:
+    """
+    Tracks dependency health, event loop lag and load for the health endpoints.
+
+    Dependencies are probed on a timer and the results are cached, so a
+    health check reads memory and never fans out network calls.
+    """
+
+    def __init__(
+        self,
+        probe_interval_seconds: float = 10.0,
+        probe_timeout_seconds: float = 2.0,
+        lag_interval_seconds: float = 0.5,
+        max_event_loop_lag_ms: float = 250.0,
+        max_in_flight: int = 1000,
+        max_pool_saturation: float = 0.9,
+    ):
+        """
+        Initialize the monitor.
+
+        Args:
+            probe_interval_seconds: Time between two rounds of dependency probes
+            probe_timeout_seconds: Timeout of a single probe
+            lag_interval_seconds: Sampling interval of the event loop lag
+            max_event_loop_lag_ms: Lag above which the worker reports overloaded
+            max_in_flight: In-flight requests above which the worker reports overloaded
+            max_pool_saturation: Upstream pool usage (0-1) above which the worker reports overloaded
+        """
+        self.probe_interval_seconds = probe_interval_seconds
+        self.probe_timeout_seconds = probe_timeout_seconds
+        self.lag_interval_seconds = lag_interval_seconds
+        self.max_event_loop_lag_ms = max_event_loop_lag_ms
+        self.max_in_flight = max_in_flight
+        self.max_pool_saturation = max_pool_saturation
+
+        self.probes: list[DependencyProbe] = []
+        self.pool_usage: Optional[Callable[[], tuple[int, int]]] = None
+        self.in_flight = 0
+        self.event_loop_lag_ms = 0.0
+        self._tasks: list[asyncio.Task] = []
+
+    def add_probe(self, name: str, check: ProbeCheck, critical: bool = True):
+        """Register a dependency probe, replacing any probe with the same name"""
+        self.probes = [probe for probe in self.probes if probe.name != name]
+        self.probes.append(DependencyProbe(name, check, critical))
+
+    async def _run_probe(self, probe: DependencyProbe):
+        started = time.perf_counter()
+        try:
+            skipped_reason = await asyncio.wait_for(probe.check(), self.probe_timeout_seconds)
+            result = {"status": "skipped", "reason": skipped_reason} if skipped_reason else {"status": "up"}
+        except Exception as e:
+            result = {"status": "down", "error": str(e) or type(e).__name__}
+            if probe.result["status"] != "down":
+                logger.warning("dependency_down", dependency=probe.name, error=result["error"])
+
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        result["checked_at"] = time.time()
+        probe.result = result
+
+    async def probe_all(self):
+        """Run every probe once, concurrently"""
+        await asyncio.gather(*(self._run_probe(probe) for probe in self.probes))
+
+    async def _probe_loop(self):
+        while True:
+            await asyncio.sleep(self.probe_interval_seconds)
+            await self.probe_all()
+
+    async def _lag_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.lag_interval_seconds)
+            lag = loop.time() - started - self.lag_interval_seconds
+            self.event_loop_lag_ms = round(max(lag, 0.0) * 1000, 2)
+
+    async def start(self):
+        """Run a first round of probes, then keep probing in the background"""
+        await self.probe_all()
+        self._tasks = [
+            asyncio.create_task(self._probe_loop()),
+            asyncio.create_task(self._lag_loop()),
+        ]
+
+    async def stop(self):
+        """Stop the background tasks"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _pool_saturation(self) -> Optional[float]:
+        if self.pool_usage is None:
+            return None
+        in_use, limit = self.pool_usage()
+        return round(in_use / limit, 3) if limit else 0.0
+
+    def _is_stale(self, result: dict) -> bool:
+        checked_at = result.get("checked_at")
+        return checked_at is None or time.time() - checked_at > 3 * self.probe_interval_seconds
+
+    def load(self) -> dict:
+        """Current load of the worker"""
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "event_loop_lag_ms": self.event_loop_lag_ms,
+            "pool_saturation": self._pool_saturation(),
+        }
+
+    def readiness(self, warmed_up: bool) -> tuple[bool, dict]:
+        """
+        Compute readiness from the cached probe results and the current load.
+
+        Args:
+            warmed_up: Whether the worker finished its startup warmup
+
+        Returns:
+            Tuple of (ready, report)
+        """
+        reasons = []
+        if not warmed_up:
+            reasons.append("warming_up")
+
+        dependencies = {}
+        for probe in self.probes:
+            result = dict(probe.result)
+            if result["status"] != "skipped" and self._is_stale(result):
+                result["status"] = "unknown" if result["checked_at"] is None else "stale"
+            result["critical"] = probe.critical
+            dependencies[probe.name] = result
+            if probe.critical and result["status"] not in ("up", "skipped"):
+                reasons.append(f"{probe.name}_{result['status']}")
+
+        load = self.load()
+        if load["event_loop_lag_ms"] > self.max_event_loop_lag_ms:
+            reasons.append("event_loop_lag")
+        if load["in_flight"] >= self.max_in_flight:
+            reasons.append("too_many_in_flight")
+        if load["pool_saturation"] is not None and load["pool_saturation"] >= self.max_pool_saturation:
+            reasons.append("pool_saturated")
+
+        ready = not reasons
+        report = {
+            "status": "ready" if ready else "not_ready",
+            "dependencies": dependencies,
+            "load": load,
+        }
+        if reasons:
+            report["reasons"] = reasons
+        return ready, report
+
+
+@lru_cache
+def get_health_monitor() -> HealthMonitor:
+    """Cached dependency status and load, read by the health endpoints"""
+    settings = get_settings()
+    return HealthMonitor(
+        probe_interval_seconds=settings.health_probe_interval_seconds,
+        probe_timeout_seconds=settings.health_probe_timeout_seconds,
+        max_event_loop_lag_ms=settings.health_max_event_loop_lag_ms,
+        max_in_flight=settings.max_concurrent_requests,
+        max_pool_saturation=settings.health_max_pool_saturation,
+    )
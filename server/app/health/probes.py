@@ -0,0 +1,42 @@
+from typing import Optional
+
+from aiohttp import ClientSession
+
+from app.config import get_settings
+from app.health import get_health_monitor
+from app.payment.x402 import get_facilitator
+from app.state import get_shared_counters
+from app.upstream import get_openai_client
+
+
+async def check_facilitator() -> Optional[str]:
+    """The facilitator answers its `/supported` endpoint"""
+    async with ClientSession() as session:
+        async with session.get(f"{get_facilitator().config['url']}/supported") as resp:
+            if resp.status >= 500:
+                raise ConnectionError(f"Facilitator returned {resp.status}")
+
+
+async def check_openai() -> Optional[str]:
+    """OpenAI accepts our API key (skipped when responses are mocked)"""
+    if get_settings().is_mock_mode():
+        return "mocked"
+    await get_openai_client().ping()
+
+
+async def check_redis() -> Optional[str]:
+    """Redis answers PING (skipped when counters are process-local)"""
+    shared_counters = get_shared_counters()
+    if not shared_counters.redis_url:
+        return "not_configured"
+    await shared_counters.ping()
+
+
+def register_probes():
+    """Register the gateway dependencies with the health monitor"""
+    health_monitor = get_health_monitor()
+    health_monitor.add_probe("facilitator", check_facilitator)
+    health_monitor.add_probe("openai", check_openai)
+    # Counters fall back to process-local values, so Redis is not critical
+    health_monitor.add_probe("redis", check_redis, critical=False)
+    health_monitor.pool_usage = get_openai_client().pool_usage
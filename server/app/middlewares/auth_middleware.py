@@ -1,25 +1,46 @@
+from __future__ import annotations
+
 from decimal import Decimal
-import json
-from fastapi import Request
-from fastapi.responses import JSONResponse
+from typing import TYPE_CHECKING, AsyncIterator
 import structlog
-from app.payment.x402 import PaymentRequiredException, create_exact_payment_requirements, settle_payment, verify_payment
-
-from fastapi import FastAPI, Request, Response
-from fastapi.responses import JSONResponse
-from x402.encoding import safe_base64_encode
-from x402.types import (
-    SettleResponse,
+from app.payment.quotas import QuotaExceededException, get_payer_quotas
+from app.payment.x402 import (
+    PaymentRequiredException,
+    create_exact_payment_requirements,
+    decode_payment_header,
+    payer_address,
+    settle_payment,
+    verify_payment,
 )
 
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
 from app.cost.pricing_engine import PricingEngine
-from app.cost.token_counter import count_message_tokens, count_tokens
-from app.config import settings
+from app.cost.request_analyzer import RequestAnalysis, UsageAnalysis, analyze_batch, analyze_request, analyze_usage
+from app.config import get_settings
+from app.serialization import ORJSONResponse, loads
+from app.state import get_shared_counters
+from app.tracing import current_span_context, start_span
+
+if TYPE_CHECKING:
+    from x402.types import SettleResponse
 
 
 logger = structlog.get_logger(__name__)
 pricing_engine = PricingEngine()
 
+# One payment covers every request of a batch
+BATCH_PATH = "/v1/batch"
+
+CORS_HEADERS = {
+    "Content-Type": "application/json",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "*",
+    "Access-Control-Allow-Headers": "*",
+    "Access-Control-Allow-Credentials": "true",
+}
+
 def settle_response_header(response: SettleResponse) -> str:
     """
     Creates a settlement response header.
@@ -33,48 +54,96 @@ def settle_response_header(response: SettleResponse) -> str:
     Returns:
         A base64 encoded string containing the settlement response
     """
+    from x402.encoding import safe_base64_encode
+
     return safe_base64_encode(response.model_dump_json(by_alias=True))
 
 
-def parse_request_body(body: dict) -> tuple[str, list, int]:
+def parse_response_usage(body_bytes: bytes, content_type: str) -> dict:
     """
-    Extract model, input data, and max tokens from request body.
+    Extract usage data from a response body.
 
     Args:
-        body: The parsed request body
+        body_bytes: The response body
+        content_type: The response Content-Type
 
     Returns:
-        Tuple of (model, input_data, max_tokens)
+        The usage dict, or an empty dict if the response has none
     """
-    model = body.get("model", "gpt-3.5-turbo")
-    input_data = body.get("input", [])
-    max_tokens = body.get("max_output_tokens", 1000)
-    return model, input_data, max_tokens
+    # Streamed responses carry the final usage in the `response.completed` event
+    if content_type.startswith("text/event-stream"):
+        return parse_event_stream_usage(body_bytes)
+
+    response_body = loads(body_bytes)
+    return response_body.get("usage") or {}
 
 
-async def parse_response_body(response) -> dict:
+def parse_event_stream_usage(body_bytes: bytes) -> dict:
     """
-    Extract usage data from StreamingResponse.
+    Extract usage data from a server-sent events body.
 
     Args:
-        response: The StreamingResponse object from middleware
+        body_bytes: The raw `text/event-stream` response body
 
     Returns:
-        Tuple of (usage dict, response body bytes)
+        The usage dict of the `response.completed` event, or an empty dict
     """
-    # Collect response body chunks
-    body_bytes = b""
-    async for chunk in response.body_iterator:
-        body_bytes += chunk
+    for line in reversed(body_bytes.splitlines()):
+        if not line.startswith(b"data:"):
+            continue
+        event = loads(line[len(b"data:"):])
+        if event.get("type") == "response.completed":
+            return event.get("response", {}).get("usage") or {}
+    return {}
 
-    # Parse JSON to get usage data
-    response_body = json.loads(body_bytes.decode())
-    usage = response_body.get("usage", {})
 
-    return usage, body_bytes
+class UsageMeter:
+    """
+    Collects the token usage of a response body while it is sent to the client.
 
+    Batch (NDJSON) bodies are parsed line by line as they stream, so only the
+    usage of each result is kept; other bodies are buffered and parsed at the end.
+    """
 
-def estimate_cost(body: dict) -> tuple[Decimal, str, int]:
+    def __init__(self, content_type: str):
+        self.content_type = content_type
+        self.is_batch = content_type.startswith("application/x-ndjson")
+        self.usages: dict[int, UsageAnalysis] = {}
+        self._buffer = b""
+
+    def feed(self, chunk: bytes):
+        self._buffer += chunk
+        if self.is_batch:
+            *lines, self._buffer = self._buffer.split(b"\n")
+            for line in lines:
+                self._add_batch_line(line)
+
+    def _add_batch_line(self, line: bytes):
+        if not line.strip():
+            return
+        result = loads(line)
+        usage = analyze_usage((result.get("response") or {}).get("usage"))
+        if usage is not None:
+            self.usages[result["index"]] = usage
+
+    def finish(self) -> dict[int, UsageAnalysis]:
+        """
+        Parse what is left of the body.
+
+        Returns:
+            Usage of each request that reported one, by index in the batch
+        """
+        if self.is_batch:
+            self._add_batch_line(self._buffer)
+        else:
+            usage = analyze_usage(parse_response_usage(self._buffer, self.content_type))
+            if usage is not None:
+                self.usages[0] = usage
+        self._buffer = b""
+        return self.usages
+
+
+def estimate_cost(body: dict) -> tuple[Decimal, RequestAnalysis]:
     """
     Estimate the cost for a request.
 
@@ -82,62 +151,142 @@ def estimate_cost(body: dict) -> tuple[Decimal, str, int]:
         body: The parsed request body
 
     Returns:
-        Tuple of (estimated_cost, model, input_tokens)
+        Tuple of (estimated_cost, request_analysis)
+
+    Raises:
+        ValueError: If the request is malformed
     """
-    model, input_data, max_tokens = parse_request_body(body)
+    analysis = analyze_request(body)
 
-    # Count input tokens
-    input_tokens = count_tokens(input_data, model)
+    # Estimate cost (this is the escrow amount), assuming no prompt cache hits
+    estimated_cost = pricing_engine.estimate_cost(
+        analysis.pricing_model, analysis.input_tokens, analysis.max_output_tokens
+    )
 
-    # Estimate cost (this is the escrow amount)
-    estimated_cost = pricing_engine.estimate_cost(model, input_tokens, max_tokens)
+    return estimated_cost, analysis
+
+
+def estimate_batch_cost(body: dict) -> tuple[Decimal, list[RequestAnalysis]]:
+    """
+    Estimate the total cost of a batch in one pass.
 
-    return estimated_cost, model, input_tokens
+    Args:
+        body: The parsed /v1/batch body
+
+    Returns:
+        Tuple of (estimated_cost, request_analyses)
+
+    Raises:
+        ValueError: If the batch is empty, too large or malformed
+    """
+    analyses = analyze_batch(body, get_settings().batch_max_requests)
+    estimated_cost = sum(
+        (
+            pricing_engine.estimate_cost(analysis.pricing_model, analysis.input_tokens, analysis.max_output_tokens)
+            for analysis in analyses
+        ),
+        Decimal("0"),
+    )
+    return estimated_cost, analyses
 
 
-async def calculate_refund(response, estimated_cost: Decimal, model: str, input_tokens: int) -> tuple[Decimal, bytes]:
+def calculate_refund(
+    usages: dict[int, UsageAnalysis],
+    estimated_cost: Decimal,
+    analyses: list[RequestAnalysis],
+) -> Decimal:
     """
     Calculate refund based on actual vs estimated costs.
 
     Args:
-        response: The StreamingResponse object from the upstream service
+        usages: Usage reported for each request, by index (see UsageMeter); requests
+            without usage failed upstream and are not billed
         estimated_cost: The estimated cost that was charged
-        model: The model used for the request
-        input_tokens: The actual input tokens counted
+        analyses: The analyses of the requests the estimate was based on
 
     Returns:
-        Tuple of (refund_amount, response_body_bytes)
+        The refund amount
     """
     try:
-        # Parse response body to get output tokens
-        usage, body_bytes = await parse_response_body(response)
-        output_tokens = usage.get("completion_tokens", 0)
-
-        # Calculate actual cost and refund
-        actual_cost = pricing_engine.calculate_actual_cost(
-            model, input_tokens, output_tokens
-        )
+        actual_cost = Decimal("0")
+        input_tokens = cached_input_tokens = output_tokens = reasoning_tokens = 0
+        unbilled_requests = 0
+        for index, analysis in enumerate(analyses):
+            usage = usages.get(index)
+            if usage is None:
+                # No usage reported (e.g. an upstream error): OpenAI does not bill failed requests
+                unbilled_requests += 1
+                continue
+
+            actual_cost += pricing_engine.calculate_actual_cost(
+                analysis.pricing_model, usage.input_tokens, usage.output_tokens, usage.cached_input_tokens
+            )
+            input_tokens += usage.input_tokens
+            cached_input_tokens += usage.cached_input_tokens
+            output_tokens += usage.output_tokens
+            reasoning_tokens += usage.reasoning_tokens
+
+        # Calculate refund
         refund_amount = pricing_engine.calculate_refund(estimated_cost, actual_cost)
-        diff_percentage =  ((estimated_cost - actual_cost) / actual_cost) * 100
+        diff_percentage = ((estimated_cost - actual_cost) / actual_cost) * 100 if actual_cost else None
 
         if refund_amount > Decimal("0.01"):
             message = "Refund Needed"
         else:
             message = "No Refund Needed"
-            
+
         logger.info(
             message,
             refund_amount=refund_amount,
             estimated_cost=estimated_cost,
             actual_cost=actual_cost,
-            diff_percentage=diff_percentage
+            diff_percentage=diff_percentage,
+            requests=len(analyses),
+            unbilled_requests=unbilled_requests,
+            estimated_input_tokens=sum(analysis.input_tokens for analysis in analyses),
+            input_tokens=input_tokens,
+            cached_input_tokens=cached_input_tokens,
+            output_tokens=output_tokens,
+            reasoning_tokens=reasoning_tokens,
         )
 
-        return refund_amount, body_bytes
+        return refund_amount
 
     except Exception as e:
         logger.error("Error calculating refund", error=str(e))
-        return Decimal("0"), b""
+        return Decimal("0")
+
+
+async def metered_body(
+    body_iterator: AsyncIterator[bytes],
+    content_type: str,
+    estimated_cost: Decimal,
+    analyses: list[RequestAnalysis],
+    request_span_context=None,
+) -> AsyncIterator[bytes]:
+    """
+    Pass a response body through unchanged, then calculate the refund from
+    the usage it reported once it has been sent.
+
+    The request span has ended by then, so the refund gets its own span,
+    linked to the request span's context.
+    """
+    meter = UsageMeter(content_type)
+    try:
+        async for chunk in body_iterator:
+            try:
+                meter.feed(chunk)
+            except Exception as e:
+                logger.error("Error metering response", error=str(e))
+            yield chunk
+    finally:
+        try:
+            usages = meter.finish()
+        except Exception as e:
+            logger.error("Error metering response", error=str(e))
+            usages = meter.usages
+        with start_span("x402.calculate_refund", link_to=request_span_context):
+            calculate_refund(usages, estimated_cost, analyses)
 
 
 async def verify_x402_payment(request: Request, call_next):
@@ -147,72 +296,126 @@ async def verify_x402_payment(request: Request, call_next):
     if request.method != "POST" or not request.url.path.startswith("/v1/"):
         return await call_next(request)
 
-    # Parse request body once
-    body = await request.json()
+    # Parse request body once, the routes reuse it
+    body = loads(await request.body())
+    request.state.parsed_body = body
 
     # Estimate cost and get request metadata
-    estimated_cost, model, input_tokens = estimate_cost(body)
+    with start_span("x402.estimate_cost") as span:
+        try:
+            if request.url.path == BATCH_PATH:
+                estimated_cost, analyses = estimate_batch_cost(body)
+            else:
+                estimated_cost, analysis = estimate_cost(body)
+                analyses = [analysis]
+        except ValueError as e:
+            return ORJSONResponse(status_code=400, content={"detail": str(e)}, headers=CORS_HEADERS)
+
+        if request.url.path == BATCH_PATH:
+            description = f"Access OpenAI /responses endpoint ({len(analyses)} batched requests)"
+            # The route fans out the requests with the output caps they were priced with
+            request.state.request_analyses = analyses
+        else:
+            description = "Access OpenAI /responses endpoint"
+            # The route forwards the output cap the escrow was computed with
+            request.state.request_analysis = analysis
+
+        span.set_attributes({
+            "llm.model": analyses[0].model,
+            "llm.requests": len(analyses),
+            "llm.input_tokens": sum(analysis.input_tokens for analysis in analyses),
+            "llm.max_output_tokens": sum(analysis.max_output_tokens for analysis in analyses),
+        })
 
     # Use the appropriate network based on dev_mode
-    network = "base-sepolia" if settings.dev_mode else "base"
+    network = "base-sepolia" if get_settings().dev_mode else "base"
 
     payment_requirements = [
         create_exact_payment_requirements(
             price=f"${estimated_cost}",
             network=network,
             resource=str(request.url),
-            description="Access OpenAI /responses endpoint",
+            description=description,
         )
     ]
 
-    try:
-        decoded_payment = await verify_payment(request, payment_requirements)
+    amount = int(payment_requirements[0].max_amount_required)
+    payer_quotas = get_payer_quotas()
 
-        settle_response = await settle_payment(decoded_payment, payment_requirements[0])
+    try:
+        decoded_payment = decode_payment_header(request, payment_requirements)
+
+        # Quotas are local lookups, checked before paying for a facilitator call
+        payer = payer_address(decoded_payment)
+        with start_span("x402.check_quotas", ignore_exceptions=(QuotaExceededException,)):
+            payer_quotas.check(payer, [analysis.model for analysis in analyses], amount, network)
+
+        with start_span("x402.verify_payment", ignore_exceptions=(PaymentRequiredException,)):
+            await verify_payment(decoded_payment, payment_requirements)
+
+        # Spend is only reserved for verified payers, so forged headers cannot use up a cap
+        reservation = await payer_quotas.reserve(payer, amount, network)
+        try:
+            with start_span("x402.settle_payment") as span:
+                settle_response = await settle_payment(decoded_payment, payment_requirements[0])
+                span.set_attributes({
+                    "x402.settled": settle_response.success,
+                    "x402.transaction": settle_response.transaction or "",
+                })
+        except Exception:
+            payer_quotas.release(reservation)
+            raise
         logger.info(settle_response)
 
+        if settle_response.success:
+            get_shared_counters().incr("payments_settled")
+            get_shared_counters().incr("payments_settled_atomic_amount", amount)
+        else:
+            payer_quotas.release(reservation)
+
         response_header = settle_response_header(settle_response)
 
+    except QuotaExceededException as e:
+        get_shared_counters().incr("payments_rejected_quota")
+        logger.info("payer_quota_exceeded", payer=payer, status_code=e.status_code, error=e.error)
+
+        headers = dict(CORS_HEADERS)
+        if e.retry_after_seconds is not None:
+            headers["Retry-After"] = str(e.retry_after_seconds)
+        return ORJSONResponse(
+            status_code=e.status_code,
+            content={"detail": e.error},
+            headers=headers,
+        )
+
     except PaymentRequiredException as e:
-        headers = {
-        "Content-Type": "application/json",
-        "Access-Control-Allow-Origin": "*",
-        "Access-Control-Allow-Methods": "*",
-        "Access-Control-Allow-Headers": "*",
-        "Access-Control-Allow-Credentials": "true",
-    }
-
-        return JSONResponse(
+        get_shared_counters().incr("payments_required")
+
+        return ORJSONResponse(
             status_code=402,
             content=e.error_data,
-            headers=headers,
+            headers=CORS_HEADERS,
         )
 
 
     # Call next middleware/route
-    try:
-        response = await call_next(request)
-    except Exception as e:
-       raise e
-
-    # Calculate and log refund (this consumes the response body)
-    _, body_bytes = await calculate_refund(response, estimated_cost, model, input_tokens)
-
-    # Recreate response with the consumed body and add payment header
-    return Response(
-        content=body_bytes,
+    response = await call_next(request)
+
+    # Stream the body through (SSE and batch results reach the client as they
+    # are produced) and calculate the refund once it has been sent
+    return StreamingResponse(
+        metered_body(
+            response.body_iterator,
+            response.headers.get("content-type", ""),
+            estimated_cost,
+            analyses,
+            request_span_context=current_span_context(),
+        ),
         status_code=response.status_code,
         headers={
             **dict(response.headers),
             "X-PAYMENT-RESPONSE": response_header,
-            "Access-Control-Expose-Headers": "X-PAYMENT-RESPONSE"
+            "Access-Control-Expose-Headers": "X-PAYMENT-RESPONSE, X-Request-ID"
         },
         media_type=response.media_type
     )
-    
-    
-    
-
-        
-
-    
\ No newline at end of file
@@ -0,0 +1,29 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.health import get_health_monitor
+
+
+class InFlightMiddleware:
+    """
+    Middleware counting in-flight requests for the readiness check.
+
+    This is a plain ASGI middleware rather than an `http` function middleware,
+    whose `call_next` returns once the headers are sent: a request counts
+    until its whole body has been sent, including streamed SSE and batch
+    responses.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        health_monitor = get_health_monitor()
+        health_monitor.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            health_monitor.in_flight -= 1
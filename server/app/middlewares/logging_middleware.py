@@ -4,6 +4,7 @@ import structlog
 
 structlog.configure(
     processors=[
+        structlog.contextvars.merge_contextvars,
         structlog.processors.add_log_level,
         structlog.processors.TimeStamper(fmt="iso"),
         # structlog.processors.JSONRenderer()
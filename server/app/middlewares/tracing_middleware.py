@@ -0,0 +1,42 @@
+import uuid
+from fastapi import Request
+import structlog
+
+from app.tracing import current_trace_id, mark_span_failed, start_span
+
+REQUEST_ID_HEADER = "X-Request-ID"
+MAX_REQUEST_ID_LENGTH = 128
+
+
+async def trace_request(request: Request, call_next):
+    """
+    Middleware assigning a request ID and a root span to every request.
+
+    The request ID is taken from the X-Request-ID header when the client sends
+    one, bound to every log line of the request, and returned in the response.
+    """
+    request_id = request.headers.get(REQUEST_ID_HEADER, "")
+    if not request_id or len(request_id) > MAX_REQUEST_ID_LENGTH:
+        request_id = uuid.uuid4().hex
+    request.state.request_id = request_id
+
+    attributes = {
+        "http.request.method": request.method,
+        "url.path": request.url.path,
+        "request.id": request_id,
+    }
+    with start_span(f"{request.method} {request.url.path}", attributes=attributes, headers=request.headers) as span:
+        log_context = {"request_id": request_id}
+        trace_id = current_trace_id()
+        if trace_id:
+            log_context["trace_id"] = trace_id
+
+        with structlog.contextvars.bound_contextvars(**log_context):
+            response = await call_next(request)
+
+        span.set_attribute("http.response.status_code", response.status_code)
+        if response.status_code >= 500:
+            mark_span_failed(span, f"HTTP {response.status_code}")
+
+    response.headers[REQUEST_ID_HEADER] = request_id
+    return response
@@ -0,0 +1,72 @@
+import inspect
+from typing import Optional
+
+import httpx
+from x402.facilitator import FacilitatorClient, FacilitatorConfig
+from x402.types import PaymentPayload, PaymentRequirements, SettleResponse, VerifyResponse
+
+
+class PooledFacilitatorClient(FacilitatorClient):
+    """
+    FacilitatorClient that keeps one HTTP connection pool per worker, instead
+    of opening a new client for every request.
+
+    Auth headers are still built for every request: CDP JWTs carry a
+    per-request nonce and must not be reused.
+    """
+
+    def __init__(self, config: Optional[FacilitatorConfig] = None):
+        super().__init__(config)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(follow_redirects=True)
+        return self._client
+
+    async def headers(self, operation: str) -> dict[str, str]:
+        """Request headers for a facilitator operation (`verify`, `settle`, ...)"""
+        headers = {"Content-Type": "application/json"}
+        if self.config.get("create_headers"):
+            # The CDP SDK builds headers synchronously, other configs may be async
+            custom_headers = self.config["create_headers"]()
+            if inspect.isawaitable(custom_headers):
+                custom_headers = await custom_headers
+            headers.update(custom_headers.get(operation, {}))
+        return headers
+
+    async def _post(
+        self,
+        operation: str,
+        payment: PaymentPayload,
+        payment_requirements: PaymentRequirements,
+    ) -> dict:
+        response = await self.client.post(
+            f"{self.config['url']}/{operation}",
+            json={
+                "x402Version": payment.x402_version,
+                "paymentPayload": payment.model_dump(by_alias=True),
+                "paymentRequirements": payment_requirements.model_dump(by_alias=True, exclude_none=True),
+            },
+            headers=await self.headers(operation),
+        )
+        return response.json()
+
+    async def verify(self, payment: PaymentPayload, payment_requirements: PaymentRequirements) -> VerifyResponse:
+        """Verify a payment header is valid and a request should be processed"""
+        return VerifyResponse(**await self._post("verify", payment, payment_requirements))
+
+    async def settle(self, payment: PaymentPayload, payment_requirements: PaymentRequirements) -> SettleResponse:
+        """Settle a verified payment"""
+        return SettleResponse(**await self._post("settle", payment, payment_requirements))
+
+    async def start(self):
+        """Build a set of auth headers once, so JWT signing is loaded before the first request"""
+        await self.headers("verify")
+
+    async def close(self):
+        """Close the connection pool"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
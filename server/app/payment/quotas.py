@@ -0,0 +1,231 @@
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from app.config import PayerPolicy, get_settings
+from app.cost.pricing_engine import model_family
+from app.state import SharedCounters
+
+# Spend counters outlive their window by this much, so late syncs still land in Redis
+SPEND_KEY_TTL_SLACK_SECONDS = 3600
+# A worker stops reading back a payer's spend after this many syncs without a request from them
+SPEND_KEY_MAX_IDLE_SYNCS = 300
+
+
+class QuotaExceededException(Exception):
+    """Raised when a payer is not allowed to make a request"""
+
+    def __init__(self, status_code: int, error: str, retry_after_seconds: Optional[int] = None):
+        self.status_code = status_code
+        self.error = error
+        self.retry_after_seconds = retry_after_seconds
+        super().__init__(error)
+
+
+class QuotaReservation(NamedTuple):
+    """Spend reserved for a request, released if the payment does not settle"""
+    keys: tuple[str, ...]
+    amount: int
+
+
+def spend_windows(now: datetime) -> dict[str, tuple[str, int]]:
+    """
+    Get the current daily and monthly spend windows (UTC).
+
+    Returns:
+        Dict of window name to (window ID, seconds until the window resets)
+    """
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    next_day = midnight + timedelta(days=1)
+    next_month = (midnight.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return {
+        "daily": (now.strftime("%Y-%m-%d"), int((next_day - now).total_seconds()) + 1),
+        "monthly": (now.strftime("%Y-%m"), int((next_month - now).total_seconds()) + 1),
+    }
+
+
+@lru_cache(maxsize=64)
+def usd_to_atomic(amount_usd: float, network: str) -> int:
+    """Convert a USD amount to atomic units of the network's payment asset"""
+    from x402.common import process_price_to_atomic_amount
+
+    atomic_amount, _, _ = process_price_to_atomic_amount(f"${amount_usd}", network)
+    return int(atomic_amount)
+
+
+class PayerQuotas:
+    """
+    Per-payer spend caps and model allowlists.
+
+    Spend is tracked in SharedCounters, so a check is a dictionary lookup and
+    only waits on Redis for a payer's first reservation on a worker. Each
+    worker enforces the caps exactly against its own spend, including requests
+    still in flight, and sees the other workers' spend once they have pushed
+    it and it has been read back, two `sync_interval_seconds` at most. A payer
+    spreading requests over W workers can therefore overshoot a cap by at most
+    what they spend on W - 1 workers in two sync intervals. Without Redis,
+    every worker enforces the caps on its own.
+
+    Spend is only reserved, and tracked by the worker, once the payment has
+    been verified, so forged payer addresses cannot grow the tracked state or
+    use up somebody else's cap. A worker forgets a payer idle for
+    SPEND_KEY_MAX_IDLE_SYNCS syncs, and reads a payer's spend from Redis
+    before their first reservation on the worker, so forgetting a payer
+    does not loosen the bound above.
+    """
+
+    def __init__(
+        self,
+        counters: SharedCounters,
+        daily_spend_limit_usd: Optional[float] = None,
+        monthly_spend_limit_usd: Optional[float] = None,
+        allowed_models: Optional[list[str]] = None,
+        policies: Optional[dict[str, PayerPolicy]] = None,
+    ):
+        """
+        Initialize payer quotas.
+
+        Args:
+            counters: Where spend is counted, in atomic units of the payment asset
+            daily_spend_limit_usd: Default spend cap per payer and UTC day
+            monthly_spend_limit_usd: Default spend cap per payer and UTC month
+            allowed_models: Default model allowlist (names or MODEL_PRICING families), None allows all
+            policies: Per-payer overrides of the defaults, keyed by address
+        """
+        self.counters = counters
+        self.default_policy = PayerPolicy(
+            daily_spend_limit_usd=daily_spend_limit_usd,
+            monthly_spend_limit_usd=monthly_spend_limit_usd,
+            allowed_models=allowed_models,
+        )
+        self.policies = {address.lower(): policy for address, policy in (policies or {}).items()}
+
+    def policy_for(self, payer: str) -> PayerPolicy:
+        """Get the quotas of a payer, with the defaults for everything its policy does not set"""
+        policy = self.policies.get(payer)
+        if policy is None:
+            return self.default_policy
+        return self.default_policy.model_copy(update=policy.model_dump(exclude_unset=True))
+
+    def _spend_limits(self, policy: PayerPolicy, payer: str, network: str) -> list[tuple[str, str, int, int]]:
+        """
+        Get the spend caps that apply to a payer.
+
+        Returns:
+            List of (window name, counter key, limit in atomic units, seconds until the window resets)
+        """
+        limits = {"daily": policy.daily_spend_limit_usd, "monthly": policy.monthly_spend_limit_usd}
+        return [
+            (window, f"payer_spend:{payer}:{window_id}", usd_to_atomic(limits[window], network), resets_in)
+            for window, (window_id, resets_in) in spend_windows(datetime.now(timezone.utc)).items()
+            if limits[window] is not None
+        ]
+
+    def _check_spend(self, spend_limits: list[tuple[str, str, int, int]], amount: int):
+        for window, key, limit, resets_in in spend_limits:
+            if self.counters.get(key) + amount > limit:
+                raise QuotaExceededException(
+                    429, f"{window.capitalize()} spend limit reached for this payer", retry_after_seconds=resets_in
+                )
+
+    def check(self, payer: str, models: list[str], amount: int, network: str):
+        """
+        Check a payer's quotas for a request, without reserving anything.
+
+        Runs before the payment is verified, so the payer address is not
+        authenticated yet: the check only reads counters and never creates
+        state for the address. It only sees the spend of payers this worker
+        tracks; `reserve` enforces the caps against the shared spend.
+
+        Args:
+            payer: Lowercased payer address
+            models: Models the request uses
+            amount: Price of the request in atomic units
+            network: Network the payment is made on
+
+        Raises:
+            QuotaExceededException: If a model is not allowed or a spend cap would be exceeded
+        """
+        policy = self.policy_for(payer)
+
+        if policy.allowed_models is not None:
+            denied = sorted({
+                model for model in models
+                # Unknown models have no family, they must be allowed by their exact name
+                if model not in policy.allowed_models and model_family(model) not in policy.allowed_models
+            })
+            if denied:
+                raise QuotaExceededException(403, f"Model not allowed for this payer: {', '.join(denied)}")
+
+        self._check_spend(self._spend_limits(policy, payer, network), amount)
+
+    async def reserve(self, payer: str, amount: int, network: str) -> Optional[QuotaReservation]:
+        """
+        Reserve the spend of a request once its payment is verified.
+
+        The caps are checked again, against the payer's shared spend: if this
+        worker does not track the payer yet, their spend is read from Redis
+        first. Other requests of the payer may also have been reserved while
+        this one was being verified.
+
+        Args:
+            payer: Lowercased payer address, as verified by the facilitator
+            amount: Price of the request in atomic units
+            network: Network the payment is made on
+
+        Returns:
+            The reservation to release if the payment fails, or None if no spend cap applies
+
+        Raises:
+            QuotaExceededException: If a spend cap would be exceeded
+        """
+        spend_limits = self._spend_limits(self.policy_for(payer), payer, network)
+        if not spend_limits:
+            return None
+
+        for _, key, _, _ in spend_limits:
+            await self.counters.track(key)
+
+        self._check_spend(spend_limits, amount)
+        for _, key, _, resets_in in spend_limits:
+            self.counters.incr(key, amount, ttl_seconds=resets_in + SPEND_KEY_TTL_SLACK_SECONDS)
+        return QuotaReservation(tuple(key for _, key, _, _ in spend_limits), amount)
+
+    def release(self, reservation: Optional[QuotaReservation]):
+        """Give back the spend of a request that was not paid for"""
+        if reservation is None:
+            return
+        for key in reservation.keys:
+            self.counters.incr(key, -reservation.amount)
+
+    async def start(self):
+        """Connect the spend counters and start syncing them"""
+        await self.counters.start()
+
+    async def stop(self):
+        """Stop syncing and flush the spend counters"""
+        await self.counters.stop()
+
+
+@lru_cache
+def get_payer_quotas() -> PayerQuotas:
+    """
+    Payer quotas from the settings.
+
+    Spend counters are kept apart from the gateway-wide counters so that
+    payer addresses do not show up in /health.
+    """
+    settings = get_settings()
+    counters = SharedCounters(
+        redis_url=settings.redis_url if settings.shared_state_backend == "redis" else None,
+        namespace="x402-gateway:payer-spend",
+        sync_interval_seconds=settings.shared_state_sync_interval_seconds,
+        max_idle_syncs=SPEND_KEY_MAX_IDLE_SYNCS,
+    )
+    return PayerQuotas(
+        counters,
+        daily_spend_limit_usd=settings.payer_daily_spend_limit_usd,
+        monthly_spend_limit_usd=settings.payer_monthly_spend_limit_usd,
+        allowed_models=settings.payer_allowed_models,
+        policies=settings.payer_policies,
+    )
@@ -1,41 +1,60 @@
-import json
-import uuid
-from typing import Optional
-from aiohttp import ClientSession
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING
 from fastapi import Request
 import structlog
-from app.config import settings
-
-from x402.common import process_price_to_atomic_amount, x402_VERSION
-from x402.exact import decode_payment
-from x402.facilitator import FacilitatorClient, FacilitatorConfig
-from x402.encoding import safe_base64_encode
-from x402.common import find_matching_payment_requirements
-from x402.types import (
-    PaymentPayload,
-    PaymentRequirements,
-    Price,
-    SupportedNetworks,
-    x402PaymentRequiredResponse,
-    SettleResponse,
-)
-import os
-from cdp.x402 import create_facilitator_config
+from app.config import get_settings
+from app.tracing import start_span
+
+# The x402 and CDP SDKs (and eth_account behind them) take seconds to import,
+# so they are imported on first use and not when the app is loaded
+if TYPE_CHECKING:
+    from app.payment.facilitator import PooledFacilitatorClient
+    from x402.types import (
+        PaymentPayload,
+        PaymentRequirements,
+        Price,
+        SupportedNetworks,
+        SettleResponse,
+    )
 
 logger = structlog.get_logger(__name__)
 
 
+@lru_cache
+def get_facilitator() -> PooledFacilitatorClient:
+    """Build the facilitator client, once, during the app warmup"""
+    from x402.facilitator import FacilitatorConfig
 
+    from app.payment.facilitator import PooledFacilitatorClient
+
+    settings = get_settings()
+    if settings.dev_mode:
+        facilitator_config: FacilitatorConfig = {"url": settings.x402_facilitator_url}
+    else:
+        from cdp.x402 import create_facilitator_config
+
+        facilitator_config = create_facilitator_config(
+            api_key_id=settings.cdp_api_key,
+            api_key_secret=settings.cdp_api_key_secret,
+        )
+
+    return PooledFacilitatorClient(facilitator_config)
+
+
+async def close_facilitator():
+    """Close the facilitator connection pool, if the client was built"""
+    if get_facilitator.cache_info().currsize:
+        await get_facilitator().close()
 
-if settings.dev_mode:
-    facilitator_config: FacilitatorConfig = {"url": settings.x402_facilitator_url}
-else:
-    facilitator_config = create_facilitator_config(
-        api_key_id=settings.cdp_api_key,
-        api_key_secret=settings.cdp_api_key_secret,
-    )
 
-facilitator = FacilitatorClient(facilitator_config)
+def import_sdks():
+    """Import the SDK modules used on the request path ahead of the first request"""
+    import x402.common  # noqa: F401
+    import x402.encoding  # noqa: F401
+    import x402.exact  # noqa: F401
+    import x402.types  # noqa: F401
 
 
 def create_exact_payment_requirements(
@@ -65,6 +84,9 @@ def create_exact_payment_requirements(
     Raises:
         ValueError: If price format is invalid
     """
+    from x402.common import process_price_to_atomic_amount
+    from x402.types import PaymentRequirements
+
     try:
         max_amount_required, asset_address, eip712_domain = (
             process_price_to_atomic_amount(price, network)
@@ -79,13 +101,30 @@ def create_exact_payment_requirements(
         resource=resource,
         description=description,
         mime_type=mime_type,
-        pay_to=str(settings.get_wallet_address()),
+        pay_to=str(get_settings().get_wallet_address()),
         max_timeout_seconds=max_timeout_seconds,
         asset=asset_address,
         output_schema=None,
         extra=eip712_domain,
     )
 
+def payment_required_body(error: str, payment_requirements: list[PaymentRequirements]) -> dict:
+    """
+    Build the body of a 402 response.
+
+    Dumped in JSON mode so it only holds JSON types and is rendered directly
+    by the orjson response class.
+    """
+    from x402.common import x402_VERSION
+    from x402.types import x402PaymentRequiredResponse
+
+    return x402PaymentRequiredResponse(
+        x402_version=x402_VERSION,
+        error=error,
+        accepts=payment_requirements,
+    ).model_dump(mode="json", by_alias=True, exclude_none=True)
+
+
 class PaymentRequiredException(Exception):
     """Custom exception for payment required responses"""
 
@@ -94,69 +133,86 @@ class PaymentRequiredException(Exception):
         super().__init__(error_data.get("error", "Payment required"))
 
 
-async def verify_payment(
+def decode_payment_header(
     request: Request,
     payment_requirements: list[PaymentRequirements],
 ) -> PaymentPayload:
     """
-    Verifies a payment and raises PaymentRequiredException if invalid.
+    Decodes the X-PAYMENT header without contacting the facilitator.
 
     Args:
         request: The FastAPI request object
-        payment_requirements: List of payment requirements to verify against
+        payment_requirements: Payment requirements returned if the header is missing or invalid
 
     Returns:
-        True if payment is valid
+        The decoded payment payload
 
     Raises:
-        PaymentRequiredException: If payment is required or invalid
+        PaymentRequiredException: If the header is missing or malformed
     """
+    from x402.common import x402_VERSION
+    from x402.exact import decode_payment
+    from x402.types import PaymentPayload
+
     x_payment = request.headers.get("X-PAYMENT")
     if not x_payment:
-        error_data = x402PaymentRequiredResponse(
-            x402_version=x402_VERSION,
-            error="X-PAYMENT header is required",
-            accepts=payment_requirements,
-        ).model_dump(by_alias=True, exclude_none=True)
+        error_data = payment_required_body("X-PAYMENT header is required", payment_requirements)
         raise PaymentRequiredException(error_data)
 
     try:
         decoded_payment_dict = decode_payment(x_payment)
         decoded_payment_dict["x402Version"] = x402_VERSION
-        decoded_payment = PaymentPayload(**decoded_payment_dict)
+        return PaymentPayload(**decoded_payment_dict)
     except Exception as e:
-        error_data = x402PaymentRequiredResponse(
-            x402_version=x402_VERSION,
-            error=str(e) or "Invalid or malformed payment header",
-            accepts=payment_requirements,
-        ).model_dump(by_alias=True, exclude_none=True)
+        error_data = payment_required_body(str(e) or "Invalid or malformed payment header", payment_requirements)
         raise PaymentRequiredException(error_data)
 
+
+def payer_address(payment: PaymentPayload) -> str:
+    """Lowercased address of the wallet that signed the payment authorization"""
+    return payment.payload.authorization.from_.lower()
+
+
+async def verify_payment(
+    decoded_payment: PaymentPayload,
+    payment_requirements: list[PaymentRequirements],
+) -> PaymentPayload:
+    """
+    Verifies a decoded payment with the facilitator and raises PaymentRequiredException if invalid.
+
+    Args:
+        decoded_payment: The payment decoded by `decode_payment_header`
+        payment_requirements: List of payment requirements to verify against
+
+    Returns:
+        The verified payment payload
+
+    Raises:
+        PaymentRequiredException: If payment is invalid
+    """
+    from x402.common import find_matching_payment_requirements
+
     try:
         selected_payment_requirement = find_matching_payment_requirements(
             payment_requirements, decoded_payment
         ) or payment_requirements[0]
-        verify_response = await facilitator.verify(
-            decoded_payment, selected_payment_requirement
-        )
+        with start_span("facilitator.verify"):
+            verify_response = await get_facilitator().verify(
+                decoded_payment, selected_payment_requirement
+            )
         if not verify_response.is_valid:
-            error_data = x402PaymentRequiredResponse(
-                x402_version=x402_VERSION,
-                error=verify_response.invalid_reason or "Payment verification failed",
-                accepts=payment_requirements,
-            ).model_dump(by_alias=True, exclude_none=True)
+            error_data = payment_required_body(
+                verify_response.invalid_reason or "Payment verification failed", payment_requirements
+            )
             raise PaymentRequiredException(error_data)
         
     except Exception as e:
-        error_data = x402PaymentRequiredResponse(
-            x402_version=x402_VERSION,
-            error=str(e),
-            accepts=payment_requirements,
-        ).model_dump(by_alias=True, exclude_none=True)
+        error_data = payment_required_body(str(e), payment_requirements)
         raise PaymentRequiredException(error_data)
     
     return decoded_payment
     
 
 async def settle_payment(payment: PaymentPayload, payment_requirements: PaymentRequirements) -> SettleResponse:
-    return await facilitator.settle(payment, payment_requirements)
\ No newline at end of file
+    with start_span("facilitator.settle"):
+        return await get_facilitator().settle(payment, payment_requirements)
\ No newline at end of file
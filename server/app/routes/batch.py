@@ -0,0 +1,126 @@
+import asyncio
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+import structlog
+
+from app.config import get_settings
+from app.cost.request_analyzer import RequestAnalysis, analyze_batch
+from app.routes.openai import call_openai
+from app.serialization import dumps, request_json
+from app.tracing import start_span
+from app.upstream import get_mock_upstream
+
+router = APIRouter()
+logger = structlog.get_logger(__name__)
+
+
+async def call_upstream(body: dict) -> bytes:
+    """Call OpenAI, or the mock upstream in dev mode, and get the raw response body"""
+    if get_settings().dev_mode:
+        with start_span("upstream.mock", attributes={"llm.model": body.get("model", "")}):
+            return await get_mock_upstream().respond(body)
+    return await call_openai(body)
+
+
+def result_line(result: dict, response: Optional[bytes] = None) -> bytes:
+    """
+    Serialize a batch result as an NDJSON line.
+
+    The upstream response is spliced in as raw bytes instead of being parsed
+    and serialized again. Line breaks can only be whitespace between JSON
+    tokens (they are escaped inside strings), so dropping them keeps a
+    pretty-printed response on one line.
+    """
+    line = dumps(result)
+    if response is not None:
+        line = line[:-1] + b',"response":' + response.replace(b"\r", b"").replace(b"\n", b"") + b"}"
+    return line + b"\n"
+
+
+async def run_batch_request(
+    index: int,
+    item: dict,
+    analysis: RequestAnalysis,
+    semaphore: asyncio.Semaphore,
+) -> bytes:
+    """
+    Run one request of a batch once a concurrency slot is free.
+
+    Args:
+        index: Position of the request in the batch
+        item: The batch item, `{"custom_id": ..., "body": {...}}`
+        analysis: The analysis the request was priced with
+        semaphore: Bounds the upstream calls in flight for the batch
+
+    Returns:
+        The NDJSON result line, with either the response or the error
+    """
+    body = dict(item["body"])
+    # Without an explicit limit, cap the output at what the payment covers
+    if analysis.output_tokens_capped:
+        body["max_output_tokens"] = analysis.max_output_tokens
+
+    result = {"index": index, "custom_id": item.get("custom_id")}
+    async with semaphore:
+        try:
+            response = await call_upstream(body)
+            result["status"] = 200
+            return result_line(result, response)
+        except HTTPException as e:
+            result["status"] = e.status_code
+            result["error"] = {"message": e.detail}
+        except Exception as e:
+            logger.error("batch_request_failed", index=index, error=str(e))
+            result["status"] = 500
+            result["error"] = {"message": str(e)}
+    return result_line(result)
+
+
+async def stream_batch(
+    items: list[dict],
+    analyses: list[RequestAnalysis],
+    max_concurrency: int,
+) -> AsyncIterator[bytes]:
+    """
+    Fan a batch out to upstream and yield one NDJSON line per result, in
+    completion order.
+
+    Pending requests are cancelled if the client disconnects.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks = [
+        asyncio.create_task(run_batch_request(index, item, analysis, semaphore))
+        for index, (item, analysis) in enumerate(zip(items, analyses))
+    ]
+
+    completed = 0
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+            completed += 1
+    finally:
+        for task in tasks:
+            task.cancel()
+        logger.info("batch_completed", requests=len(tasks), completed=completed)
+
+
+@router.post("/v1/batch")
+async def proxy_batch(request: Request):
+    """Run many Responses API requests, paid for with a single payment, and stream the results as NDJSON"""
+    body = await request_json(request)
+
+    # Analyses are computed by the payment middleware when it priced the batch
+    analyses: Optional[list[RequestAnalysis]] = getattr(request.state, "request_analyses", None)
+    if analyses is None:
+        try:
+            analyses = analyze_batch(body, get_settings().batch_max_requests)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    logger.info("proxy_batch_request", requests=len(analyses))
+    return StreamingResponse(
+        stream_batch(body["requests"], analyses, get_settings().batch_max_concurrency),
+        media_type="application/x-ndjson",
+    )
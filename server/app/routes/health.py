@@ -1,20 +1,69 @@
-from fastapi import APIRouter
-from fastapi.responses import JSONResponse
+import secrets
+
+from fastapi import APIRouter, HTTPException, Request
+from app.config import get_settings
+from app.health import get_health_monitor
+from app.serialization import ORJSONResponse
+from app.state import get_shared_counters
 
 router = APIRouter()
 
 
+def readiness_response(request: Request, **extra) -> ORJSONResponse:
+    """Build a 200/503 response from the cached readiness report"""
+    ready, report = get_health_monitor().readiness(getattr(request.app.state, "ready", False))
+    return ORJSONResponse(
+        status_code=200 if ready else 503,
+        content={**report, **extra},
+    )
+
+
 @router.get("/health")
-async def health_check():
-    """Health check endpoint"""
-    return JSONResponse(
+async def health_check(request: Request):
+    """Health check endpoint, same as readiness for load balancers probing /health"""
+    return readiness_response(request)
+
+
+@router.get("/health/counters")
+async def counters(request: Request):
+    """
+    Gateway-wide counters (payments, settled amounts), for operators only.
+
+    Requires `Authorization: Bearer <HEALTH_COUNTERS_TOKEN>`; the endpoint
+    does not exist unless the token is set.
+    """
+    token = get_settings().health_counters_token
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(credentials.encode(), token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid token", headers={"WWW-Authenticate": "Bearer"})
+
+    return get_shared_counters().snapshot()
+
+
+@router.get("/health/live")
+async def liveness_check():
+    """Liveness endpoint, healthy as long as the event loop answers"""
+    return ORJSONResponse(
         status_code=200,
         content={
-            "status": "healthy"
+            "status": "alive",
+            "event_loop_lag_ms": get_health_monitor().event_loop_lag_ms,
         }
     )
 
 
+@router.get("/health/ready")
+async def readiness_check(request: Request):
+    """
+    Readiness endpoint, healthy once warmed up with critical dependencies up
+    and the worker not overloaded. Reads cached probe results only.
+    """
+    return readiness_response(request)
+
+
 @router.get("/")
 async def root():
     """Root endpoint"""
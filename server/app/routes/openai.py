@@ -1,63 +1,67 @@
 from fastapi import APIRouter, Request, HTTPException, Depends
-from fastapi.responses import JSONResponse
-from aiohttp import ClientSession
-import json
+from fastapi.responses import Response, StreamingResponse
 import structlog
-import time
-from pathlib import Path
-from app.config import settings
+from app.config import get_settings
+from app.serialization import request_json
+from app.tracing import start_span
+from app.upstream import get_mock_upstream, get_openai_client
 
 router = APIRouter()
 logger = structlog.get_logger(__name__)
 
-OPENAI_API_BASE = "https://api.openai.com"
 
+async def call_openai(body: dict) -> bytes:
+    with start_span("upstream.call_openai", attributes={"llm.model": body.get("model", "")}):
+        return await get_openai_client().create_response(body)
 
-async def call_openai(body: dict):
-    async with ClientSession() as session:
-        headers = {
-            "Authorization": f"Bearer {settings.openai_api_key}",
-            "Content-Type": "application/json"
-        }
-        async with session.post(
-            f"{OPENAI_API_BASE}/v1/responses",
-            json=body,
-            headers=headers
-        ) as resp:
-            if resp.status != 200:
-                error_text = await resp.text()
-                logger.error("openai_request_failed", status=resp.status, error=error_text)
 
-                raise HTTPException(status_code=resp.status, detail=error_text)
-
-            response_data = await resp.json()
-
-        return response_data
+async def stream_openai(body: dict) -> StreamingResponse:
+    """Stream an OpenAI response through as it arrives, with the upstream content type"""
+    with start_span("upstream.call_openai", attributes={"llm.model": body.get("model", ""), "llm.stream": True}):
+        stream, content_type = await get_openai_client().open_stream(body)
+    return StreamingResponse(stream, media_type=content_type)
 
 @router.post("/v1/responses")
 async def proxy_chat_completions(request: Request):
     """Proxy chat completions to OpenAI API with escrow and refund tracking"""
     try:
         # Parse request body
-        body = await request.json()
+        body = await request_json(request)
         logger.info("proxy_request", body=body)
 
+        # Without an explicit limit, cap the output at what the payment covers
+        analysis = getattr(request.state, "request_analysis", None)
+        if analysis is not None and analysis.output_tokens_capped:
+            body["max_output_tokens"] = analysis.max_output_tokens
+
         # Forward to OpenAI or use mock response
-        if settings.dev_mode:
-            # Load mock response from sample_response.json
+        if get_settings().dev_mode:
             logger.info("using mocked response")
-            mock_file = Path(__file__).parent/ "sample_response.json"
-            with open(mock_file, 'r') as f:
-                response_data = json.load(f)
-        else:
-            response_data = await call_openai(body)
-        
+            mock_upstream = get_mock_upstream()
+            with start_span("upstream.mock", attributes={"llm.model": body.get("model", "")}):
+                if body.get("stream"):
+                    return StreamingResponse(
+                        await mock_upstream.open_stream(body),
+                        media_type="text/event-stream",
+                    )
+                content = await mock_upstream.respond(body)
+            return Response(content=content, media_type="application/json")
+
+        if body.get("stream"):
+            return await stream_openai(body)
+
+        # Forward the upstream bytes as they are, the body is only parsed for its usage
+        content = await call_openai(body)
+
         logger.info(
             "proxy_response",
-            data=response_data,
+            size_bytes=len(content),
         )
 
-        return JSONResponse(content=response_data)
+        return Response(content=content, media_type="application/json")
+
+    except HTTPException:
+        raise
 
     except Exception as e:
         logger.error("proxy_error", error=str(e))
@@ -0,0 +1,59 @@
+from decimal import Decimal
+from typing import Any
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+import orjson
+
+# Non-string dict keys (e.g. batch indexes) are serialized instead of raising
+DUMPS_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    """Serialize the types orjson does not know natively"""
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(by_alias=True, exclude_none=True)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Serialize to compact JSON bytes.
+
+    Args:
+        obj: The object to serialize
+
+    Returns:
+        UTF-8 encoded JSON
+    """
+    return orjson.dumps(obj, default=_default, option=DUMPS_OPTIONS)
+
+
+def loads(data: bytes | str) -> Any:
+    """
+    Parse JSON from bytes or str, without decoding bytes first.
+
+    Raises:
+        orjson.JSONDecodeError: If the data is not valid JSON (a ValueError)
+    """
+    return orjson.loads(data)
+
+
+async def request_json(request: Request) -> Any:
+    """
+    Get the parsed JSON body of a request, reusing the body the payment
+    middleware already parsed instead of parsing it again.
+    """
+    body = getattr(request.state, "parsed_body", None)
+    if body is None:
+        body = loads(await request.body())
+    return body
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson, the app's default response class"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
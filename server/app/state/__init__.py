@@ -0,0 +1,3 @@
+from app.state.shared_counters import SharedCounters, get_shared_counters
+
+__all__ = ["SharedCounters", "get_shared_counters"]
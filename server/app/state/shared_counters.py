@@ -0,0 +1,288 @@
+import asyncio
+import time
+import uuid
+from functools import lru_cache
+from typing import Optional
+
+import structlog
+
+from app.config import get_settings
+
+logger = structlog.get_logger(__name__)
+
+# Applies a batch of increments and reads back the totals in one step.
+# KEYS[1] marks the batch as applied, so resending a batch whose reply was
+# lost (timeout, dropped connection) does not count it twice. ARGV[1] is how
+# long that mark is kept, then (amount, TTL) for each counter in KEYS[2:];
+# a TTL is only set on counters that have none, which works on any Redis
+# version (EXPIRE NX needs Redis 7).
+SYNC_SCRIPT = """
+local apply = ARGV[1] ~= '0' and redis.call('SET', KEYS[1], '1', 'NX', 'EX', ARGV[1])
+local values = {}
+for i = 2, #KEYS do
+    local amount = tonumber(ARGV[2 * i - 2])
+    local ttl = tonumber(ARGV[2 * i - 1])
+    if apply and amount ~= 0 then
+        values[i - 1] = redis.call('INCRBY', KEYS[i], amount)
+        if ttl > 0 and redis.call('TTL', KEYS[i]) == -1 then
+            redis.call('EXPIRE', KEYS[i], ttl)
+        end
+    else
+        values[i - 1] = tonumber(redis.call('GET', KEYS[i]) or '0')
+    end
+end
+return values
+"""
+
+# Applied batches are remembered this long, well beyond any retry of a failed sync
+SYNC_BATCH_MARK_SECONDS = 3600
+
+
+class SharedCounters:
+    """
+    Integer counters shared between gateway workers.
+
+    Increments are applied locally and pushed to Redis in batches every
+    `sync_interval_seconds`, so reading or bumping a counter never waits on
+    the network. Without a Redis URL the counters are local to the process.
+
+    Between two syncs a worker sees its own increments immediately and the
+    other workers' increments up to `sync_interval_seconds` late. Only
+    counters this worker has incremented are tracked and read back.
+
+    A sync is applied atomically by a Lua script. If it fails, the same batch
+    is sent again with the same ID on the next sync, and the script skips it
+    if it was already applied, so increments are never counted twice.
+    """
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        namespace: str = "x402-gateway",
+        sync_interval_seconds: float = 1.0,
+        max_idle_syncs: Optional[int] = None,
+    ):
+        """
+        Initialize shared counters.
+
+        Args:
+            redis_url: Redis instance to sync with, or None for process-local counters
+            namespace: Prefix for the Redis keys
+            sync_interval_seconds: How often local increments are pushed to Redis
+            max_idle_syncs: Stop reading back a shared counter after this many syncs
+                without a local increment, None keeps reading it back
+        """
+        self.redis_url = redis_url
+        self.namespace = namespace
+        self.sync_interval_seconds = sync_interval_seconds
+        self.max_idle_syncs = max_idle_syncs
+
+        self._redis = None
+        self._sync_task: Optional[asyncio.Task] = None
+        self._synced: dict[str, int] = {}  # Last values read back from Redis
+        self._pending: dict[str, int] = {}  # Local increments not pushed yet
+        self._syncing: dict[str, int] = {}  # Local increments being pushed, kept until Redis confirms them
+        self._batch_id = ""
+        self._sync_script = None
+        self._expires_at: dict[str, float] = {}
+        self._ttls: dict[str, int] = {}
+        self._active_at: dict[str, int] = {}  # Sync count at the last local increment
+        self._sync_count = 0
+        self.last_sync_at: Optional[float] = None
+
+    @property
+    def is_shared(self) -> bool:
+        """Whether counters are synced with other workers"""
+        return self._redis is not None
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def incr(self, key: str, amount: int = 1, ttl_seconds: Optional[int] = None) -> int:
+        """
+        Increment a counter locally.
+
+        Args:
+            key: Counter name
+            amount: Value to add
+            ttl_seconds: Expire the counter this long after it was first incremented
+
+        Returns:
+            The counter value as seen by this worker
+        """
+        if ttl_seconds is not None and key not in self._ttls:
+            self._ttls[key] = ttl_seconds
+            self._expires_at[key] = time.monotonic() + ttl_seconds
+        self._pending[key] = self._pending.get(key, 0) + amount
+        self._active_at[key] = self._sync_count
+        return self.get(key)
+
+    def get(self, key: str) -> int:
+        """
+        Get a counter value as seen by this worker (no network call).
+
+        Reading a counter does not track it: the other workers' increments are
+        only picked up for counters this worker has incremented itself.
+
+        Args:
+            key: Counter name
+        """
+        return self._synced.get(key, 0) + self._syncing.get(key, 0) + self._pending.get(key, 0)
+
+    async def track(self, key: str):
+        """
+        Start tracking a counter, seeded with its shared total.
+
+        An untracked counter only reflects this worker's increments. Call this
+        before enforcing a limit on a counter that other workers may have
+        incremented; it costs one Redis GET, and only for untracked counters.
+
+        Args:
+            key: Counter name
+        """
+        if self._redis is None or key in self._synced:
+            return
+        try:
+            value = await self._redis.get(self._redis_key(key))
+        except Exception as e:
+            logger.warning("shared_counters_seed_failed", key=key, error=str(e))
+            return
+        # A sync may have read the counter back while waiting for Redis
+        if key not in self._synced:
+            self._synced[key] = int(value or 0)
+            self._active_at.setdefault(key, self._sync_count)
+
+    def snapshot(self) -> dict[str, int]:
+        """Get all counters tracked by this worker"""
+        return {key: self.get(key) for key in {*self._synced, *self._pending}}
+
+    def _forget(self, key: str):
+        self._synced.pop(key, None)
+        self._pending.pop(key, None)
+        self._syncing.pop(key, None)
+        self._expires_at.pop(key, None)
+        self._ttls.pop(key, None)
+        self._active_at.pop(key, None)
+
+    def _prune_expired(self):
+        now = time.monotonic()
+        for key, expires_at in list(self._expires_at.items()):
+            if expires_at <= now:
+                self._forget(key)
+
+    def _prune_idle(self):
+        # Idle counters are only dropped when Redis holds their value
+        if self.max_idle_syncs is None or self._redis is None:
+            return
+        for key, active_at in list(self._active_at.items()):
+            if self._sync_count - active_at > self.max_idle_syncs and not self._pending.get(key):
+                self._forget(key)
+
+    async def connect(self):
+        """Connect to Redis, falling back to process-local counters on failure"""
+        if not self.redis_url:
+            return
+
+        try:
+            import redis.asyncio as redis
+
+            client = redis.from_url(self.redis_url)
+            await client.ping()
+            self._redis = client
+            logger.info("shared_counters_connected", redis_url=self.redis_url)
+        except Exception as e:
+            logger.warning("shared_counters_unavailable", redis_url=self.redis_url, error=str(e))
+
+    async def ping(self):
+        """
+        Check the Redis connection, reconnecting if it was lost.
+
+        Raises:
+            ConnectionError: If Redis is configured but unreachable
+        """
+        if self._redis is None:
+            await self.connect()
+        if self._redis is None:
+            raise ConnectionError(f"Redis unavailable at {self.redis_url}")
+        await self._redis.ping()
+
+    async def sync(self):
+        """Push local increments to Redis and read back the shared totals"""
+        self._sync_count += 1
+        self._prune_expired()
+        self._prune_idle()
+
+        if self._redis is None:
+            for key, amount in self._pending.items():
+                self._synced[key] = self._synced.get(key, 0) + amount
+            self._pending.clear()
+            self.last_sync_at = time.monotonic()
+            return
+
+        # A batch that failed to sync is resent as it was, new increments wait for the next sync
+        if not self._syncing:
+            self._syncing = {key: amount for key, amount in self._pending.items() if amount}
+            self._pending = {}
+            self._batch_id = uuid.uuid4().hex if self._syncing else ""
+        batch = self._syncing
+
+        keys = list({*self._synced, *batch})
+        if not keys:
+            self.last_sync_at = time.monotonic()
+            return
+
+        if self._sync_script is None:
+            self._sync_script = self._redis.register_script(SYNC_SCRIPT)
+        args = [SYNC_BATCH_MARK_SECONDS if batch else 0]
+        for key in keys:
+            args += [batch.get(key, 0), self._ttls.get(key, 0)]
+        try:
+            values = await self._sync_script(
+                keys=[self._redis_key(f"sync-batch:{self._batch_id}"), *map(self._redis_key, keys)],
+                args=args,
+            )
+        except Exception as e:
+            # The batch may or may not have been applied; it is resent with the same ID
+            logger.warning("shared_counters_sync_failed", error=str(e))
+            return
+
+        for key, value in zip(keys, values):
+            self._synced[key] = int(value)
+        self._syncing = {}
+        self.last_sync_at = time.monotonic()
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.sync_interval_seconds)
+            await self.sync()
+
+    async def start(self):
+        """Connect and start the background sync task"""
+        await self.connect()
+        await self.sync()
+        self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self):
+        """Stop the background sync task and flush pending increments"""
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+
+        await self.sync()
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+
+@lru_cache
+def get_shared_counters() -> SharedCounters:
+    """Gateway-wide counters, synced across workers when the redis backend is enabled"""
+    settings = get_settings()
+    return SharedCounters(
+        redis_url=settings.redis_url if settings.shared_state_backend == "redis" else None,
+        sync_interval_seconds=settings.shared_state_sync_interval_seconds,
+    )
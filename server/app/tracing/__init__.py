@@ -0,0 +1,3 @@
+from app.tracing.tracer import current_span_context, current_trace_id, mark_span_failed, setup_tracing, shutdown_tracing, start_span
+
+__all__ = ["current_span_context", "current_trace_id", "mark_span_failed", "setup_tracing", "shutdown_tracing", "start_span"]
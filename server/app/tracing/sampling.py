@@ -0,0 +1,161 @@
+import queue
+import threading
+from typing import Optional, Sequence
+
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor
+from opentelemetry.sdk.trace.export import SpanExporter
+from opentelemetry.sdk.trace.sampling import Decision, Sampler, SamplingResult, TraceIdRatioBased
+from opentelemetry.trace import Link, SpanKind, StatusCode, get_current_span
+from opentelemetry.trace.span import TraceState
+from opentelemetry.util.types import Attributes
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+class HeadSampler(Sampler):
+    """
+    Head sampling by trace ID ratio, inheriting the parent's decision. A root
+    span linked to other spans (work that outlives a request) follows the
+    decision of the spans it links to.
+
+    Traces that are not head-sampled are dropped, or only recorded when
+    `record_unsampled` is set so that TailSamplingSpanProcessor can still
+    keep them if they turn out slow or failed.
+    """
+
+    def __init__(self, ratio: float, record_unsampled: bool = False):
+        self._ratio_sampler = TraceIdRatioBased(ratio)
+        self._record_unsampled = record_unsampled
+
+    def should_sample(
+        self,
+        parent_context: Optional[Context],
+        trace_id: int,
+        name: str,
+        kind: Optional[SpanKind] = None,
+        attributes: Attributes = None,
+        links: Optional[Sequence[Link]] = None,
+        trace_state: Optional[TraceState] = None,
+    ) -> SamplingResult:
+        parent = get_current_span(parent_context).get_span_context()
+        if parent.is_valid:
+            sampled = parent.trace_flags.sampled
+            trace_state = parent.trace_state
+        elif links:
+            sampled = any(link.context.trace_flags.sampled for link in links)
+        else:
+            sampled = self._ratio_sampler.should_sample(parent_context, trace_id, name).decision.is_sampled()
+
+        if sampled:
+            decision = Decision.RECORD_AND_SAMPLE
+        elif self._record_unsampled:
+            decision = Decision.RECORD_ONLY
+        else:
+            return SamplingResult(Decision.DROP, None, trace_state)
+        return SamplingResult(decision, attributes, trace_state)
+
+    def get_description(self) -> str:
+        return f"HeadSampler({self._ratio_sampler.rate}, record_unsampled={self._record_unsampled})"
+
+
+class TailSamplingSpanProcessor(SpanProcessor):
+    """
+    Buffers the spans of a trace until its local root ends, then exports the
+    whole trace if it was head-sampled, failed, or took longer than
+    `latency_threshold_ms`.
+
+    Exports run on a background thread so the event loop never waits on the
+    exporter. Kept traces wait in a bounded queue; when the exporter falls
+    behind, new traces are dropped instead of piling up in memory.
+
+    The SDK's BatchSpanProcessor is not used for the queue because it drops
+    spans that were not head-sampled, which are exactly the ones kept here.
+    """
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        latency_threshold_ms: Optional[float] = None,
+        max_buffered_traces: int = 10000,
+        max_export_queue_size: int = 256,
+    ):
+        """
+        Initialize the processor.
+
+        Args:
+            exporter: Where kept traces are exported
+            latency_threshold_ms: Keep traces whose root span took longer; None disables tail sampling
+            max_buffered_traces: Traces buffered at once before the oldest is dropped
+            max_export_queue_size: Kept traces waiting for export before new ones are dropped
+        """
+        self._exporter = exporter
+        self._latency_threshold_ns = latency_threshold_ms * 1_000_000 if latency_threshold_ms is not None else None
+        self._max_buffered_traces = max_buffered_traces
+        self._traces: dict[int, list[ReadableSpan]] = {}
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(maxsize=max_export_queue_size)
+        self.dropped_traces = 0
+        self._worker = threading.Thread(target=self._export_loop, name="span-export", daemon=True)
+        self._worker.start()
+
+    def on_start(self, span, parent_context: Optional[Context] = None) -> None:
+        pass
+
+    def on_end(self, span: ReadableSpan) -> None:
+        trace_id = span.context.trace_id
+        is_local_root = span.parent is None or span.parent.is_remote
+
+        with self._lock:
+            spans = self._traces.setdefault(trace_id, [])
+            spans.append(span)
+            if not is_local_root:
+                if len(self._traces) > self._max_buffered_traces:
+                    self._traces.pop(next(iter(self._traces)))
+                return
+            del self._traces[trace_id]
+
+        if self._keep(span, spans):
+            try:
+                self._queue.put_nowait(spans)
+            except queue.Full:
+                self.dropped_traces += 1
+                if self.dropped_traces % 1000 == 1:
+                    logger.warning("span_export_queue_full", dropped_traces=self.dropped_traces)
+
+    def _export_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            try:
+                self._exporter.export(item)
+            except Exception as e:
+                logger.warning("span_export_failed", error=str(e))
+
+    def _keep(self, root: ReadableSpan, spans: list[ReadableSpan]) -> bool:
+        if root.context.trace_flags.sampled:
+            return True
+        if self._latency_threshold_ns is None:
+            return False
+        if root.end_time - root.start_time > self._latency_threshold_ns:
+            return True
+        return any(span.status.status_code is StatusCode.ERROR for span in spans)
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """Wait for the exports queued so far"""
+        flushed = threading.Event()
+        try:
+            self._queue.put(flushed, timeout=timeout_millis / 1000)
+        except queue.Full:
+            return False
+        return flushed.wait(timeout=timeout_millis / 1000)
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._worker.join()
+        self._exporter.shutdown()
@@ -0,0 +1,181 @@
+from contextlib import contextmanager
+from typing import Iterator, Mapping, Optional
+
+import structlog
+
+from app.config import get_settings
+
+logger = structlog.get_logger(__name__)
+
+# Set by setup_tracing; while None, spans are no-ops and OpenTelemetry is never imported
+_tracer_provider = None
+_tracer = None
+
+
+class _NoopSpan:
+    """Stand-in span used while tracing is disabled"""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def set_status(self, status, description=None):
+        pass
+
+    def record_exception(self, exception, attributes=None):
+        pass
+
+    def is_recording(self) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def setup_tracing(exporter=None):
+    """
+    Configure tracing if enabled in the settings, or if an exporter is given.
+
+    Args:
+        exporter: Span exporter to use instead of OTLP, e.g. an
+            InMemorySpanExporter in tests
+
+    Returns:
+        The tracer provider, or None if tracing is disabled
+    """
+    global _tracer_provider, _tracer
+
+    settings = get_settings()
+    if exporter is None and not settings.tracing_enabled:
+        return None
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+
+    from app.tracing.sampling import HeadSampler, TailSamplingSpanProcessor
+
+    if exporter is None:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        exporter = OTLPSpanExporter(endpoint=settings.tracing_otlp_endpoint)
+
+    tail_latency_ms = settings.tracing_tail_latency_ms
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.tracing_service_name}),
+        sampler=HeadSampler(settings.tracing_sample_ratio, record_unsampled=tail_latency_ms is not None),
+    )
+    provider.add_span_processor(TailSamplingSpanProcessor(exporter, latency_threshold_ms=tail_latency_ms))
+
+    _tracer_provider = provider
+    _tracer = provider.get_tracer("x402-ai-gateway")
+    logger.info(
+        "tracing_enabled",
+        exporter=type(exporter).__name__,
+        sample_ratio=settings.tracing_sample_ratio,
+        tail_latency_ms=tail_latency_ms,
+    )
+    return provider
+
+
+def shutdown_tracing():
+    """Flush pending spans and disable tracing"""
+    global _tracer_provider, _tracer
+
+    if _tracer_provider is not None:
+        _tracer_provider.shutdown()
+    _tracer_provider = None
+    _tracer = None
+
+
+@contextmanager
+def start_span(
+    name: str,
+    attributes: Optional[Mapping] = None,
+    headers: Optional[Mapping[str, str]] = None,
+    ignore_exceptions: tuple = (),
+    link_to=None,
+) -> Iterator:
+    """
+    Start a span as the child of the current span.
+
+    Args:
+        name: Span name
+        attributes: Span attributes
+        headers: Incoming request headers to continue a W3C `traceparent` from
+        ignore_exceptions: Exception types that are part of the normal flow
+            (e.g. payment required) and do not mark the span as failed
+        link_to: Span context (see `current_span_context`) to link to instead, starting
+            a new trace, for work that runs after that span has ended
+
+    Yields:
+        The span, or a no-op span while tracing is disabled
+    """
+    if _tracer is None:
+        yield NOOP_SPAN
+        return
+
+    from opentelemetry.trace import StatusCode
+
+    context = None
+    links = None
+    if headers is not None:
+        from opentelemetry.propagate import extract
+
+        context = extract(headers)
+    if link_to is not None:
+        from opentelemetry.context import Context
+        from opentelemetry.trace import Link
+
+        context = Context()
+        links = [Link(link_to)]
+
+    with _tracer.start_as_current_span(
+        name,
+        context=context,
+        links=links,
+        attributes=attributes,
+        record_exception=False,
+        set_status_on_exception=False,
+    ) as span:
+        try:
+            yield span
+        except ignore_exceptions:
+            raise
+        except Exception as e:
+            span.record_exception(e)
+            span.set_status(StatusCode.ERROR, str(e))
+            raise
+
+
+def mark_span_failed(span, description: Optional[str] = None):
+    """Mark a span as failed without an exception (e.g. a 5xx response)"""
+    if not span.is_recording():
+        return
+
+    from opentelemetry.trace import StatusCode
+
+    span.set_status(StatusCode.ERROR, description)
+
+
+def current_span_context():
+    """Context of the current span, to link later spans to, or None while tracing is disabled"""
+    if _tracer is None:
+        return None
+
+    from opentelemetry.trace import get_current_span
+
+    span_context = get_current_span().get_span_context()
+    return span_context if span_context.is_valid else None
+
+
+def current_trace_id() -> Optional[str]:
+    """Hex trace ID of the current span, if tracing is enabled"""
+    if _tracer is None:
+        return None
+
+    from opentelemetry.trace import get_current_span
+
+    span_context = get_current_span().get_span_context()
+    return format(span_context.trace_id, "032x") if span_context.is_valid else None
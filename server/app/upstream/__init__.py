@@ -0,0 +1,4 @@
+from app.upstream.mock_upstream import MockUpstream, get_mock_upstream
+from app.upstream.openai_client import OpenAIClient, get_openai_client
+
+__all__ = ["MockUpstream", "OpenAIClient", "get_mock_upstream", "get_openai_client"]
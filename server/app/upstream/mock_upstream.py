@@ -0,0 +1,226 @@
+import asyncio
+import copy
+import math
+import random
+from functools import lru_cache
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException
+
+from app.config import get_settings
+from app.serialization import dumps, loads
+
+DEFAULT_FIXTURE = Path(__file__).parent / "fixtures" / "sample_response.json"
+
+LATENCY_DISTRIBUTIONS = ("none", "fixed", "uniform", "normal", "lognormal", "exponential")
+
+
+class MockUpstream:
+    """
+    Synthetic stand-in for the OpenAI /v1/responses endpoint.
+
+    The fixture is loaded and serialized once at construction, so serving a
+    response is a memory copy plus whatever latency the configuration asks for.
+    """
+
+    def __init__(
+        self,
+        fixture_path: Path = DEFAULT_FIXTURE,
+        latency_distribution: str = "none",
+        latency_ms: float = 0.0,
+        latency_stddev_ms: float = 0.0,
+        input_tokens: Optional[int] = None,
+        output_tokens: Optional[int] = None,
+        stream_chunks: int = 16,
+        stream_chunk_interval_ms: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initialize the mock upstream.
+
+        Args:
+            fixture_path: JSON file holding a Responses API response body
+            latency_distribution: One of LATENCY_DISTRIBUTIONS
+            latency_ms: Mean time to first byte
+            latency_stddev_ms: Spread of the latency distribution
+            input_tokens: Override usage.input_tokens in the fixture
+            output_tokens: Override usage.output_tokens in the fixture
+            stream_chunks: Number of text deltas emitted for streaming requests
+            stream_chunk_interval_ms: Delay between streamed deltas
+            error_rate: Probability (0-1) that a request fails
+            error_status: HTTP status returned for injected failures
+
+        Raises:
+            ValueError: If the latency distribution or error rate is invalid
+        """
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(
+                f"Invalid latency distribution: {latency_distribution}. "
+                f"Expected one of {', '.join(LATENCY_DISTRIBUTIONS)}"
+            )
+        if not 0.0 <= error_rate <= 1.0:
+            raise ValueError(f"Invalid error rate: {error_rate}. Expected a value between 0 and 1")
+
+        self.latency_distribution = latency_distribution
+        self.latency_ms = max(latency_ms, 0.0)
+        self.latency_stddev_ms = max(latency_stddev_ms, 0.0)
+        self.stream_chunk_interval_ms = max(stream_chunk_interval_ms, 0.0)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+
+        with open(fixture_path, "rb") as f:
+            response_data = loads(f.read())
+
+        usage = response_data.setdefault("usage", {})
+        if input_tokens is not None:
+            usage["input_tokens"] = input_tokens
+        if output_tokens is not None:
+            usage["output_tokens"] = output_tokens
+        usage["total_tokens"] = usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+
+        self.response_data = response_data
+        self.response_bytes = dumps(response_data)
+        self.error_bytes = dumps({
+            "error": {
+                "message": "Injected upstream failure",
+                "type": "server_error",
+                "code": "mock_upstream_error",
+            }
+        })
+        self.stream_events = self._build_stream_events(response_data, max(stream_chunks, 1))
+
+    @classmethod
+    def from_settings(cls, settings) -> "MockUpstream":
+        """Build a mock upstream from the `mock_*` gateway settings"""
+        return cls(
+            latency_distribution=settings.mock_latency_distribution,
+            latency_ms=settings.mock_latency_ms,
+            latency_stddev_ms=settings.mock_latency_stddev_ms,
+            input_tokens=settings.mock_input_tokens,
+            output_tokens=settings.mock_output_tokens,
+            stream_chunks=settings.mock_stream_chunks,
+            stream_chunk_interval_ms=settings.mock_stream_chunk_interval_ms,
+            error_rate=settings.mock_error_rate,
+            error_status=settings.mock_error_status,
+            seed=settings.mock_seed,
+        )
+
+    @staticmethod
+    def _sse(event: str, data: dict) -> bytes:
+        return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+    def _build_stream_events(self, response_data: dict, stream_chunks: int) -> list[bytes]:
+        """Pre-serialize the server-sent events for a streamed response"""
+        text = "".join(
+            part.get("text", "")
+            for item in response_data.get("output", [])
+            if item.get("type") == "message"
+            for part in item.get("content", [])
+        )
+        chunk_size = max(math.ceil(len(text) / stream_chunks), 1)
+        deltas = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+        in_progress = copy.deepcopy(response_data)
+        in_progress["status"] = "in_progress"
+        in_progress["output"] = []
+        in_progress["usage"] = None
+
+        events = [self._sse("response.created", {"type": "response.created", "response": in_progress})]
+        for sequence_number, delta in enumerate(deltas, start=1):
+            events.append(self._sse("response.output_text.delta", {
+                "type": "response.output_text.delta",
+                "sequence_number": sequence_number,
+                "output_index": 0,
+                "content_index": 0,
+                "delta": delta,
+            }))
+        events.append(self._sse("response.completed", {
+            "type": "response.completed",
+            "sequence_number": len(deltas) + 1,
+            "response": response_data,
+        }))
+        return events
+
+    def sample_latency(self) -> float:
+        """Draw a time-to-first-byte in seconds from the configured distribution"""
+        mean = self.latency_ms
+        stddev = self.latency_stddev_ms
+
+        if self.latency_distribution == "none" or mean <= 0:
+            return 0.0
+        if self.latency_distribution == "fixed":
+            latency_ms = mean
+        elif self.latency_distribution == "uniform":
+            latency_ms = self._random.uniform(mean - stddev, mean + stddev)
+        elif self.latency_distribution == "normal":
+            latency_ms = self._random.gauss(mean, stddev)
+        elif self.latency_distribution == "lognormal":
+            # Parametrized so that the samples have the requested mean and stddev
+            sigma_squared = math.log(1 + (stddev / mean) ** 2)
+            latency_ms = self._random.lognormvariate(math.log(mean) - sigma_squared / 2, math.sqrt(sigma_squared))
+        else:
+            latency_ms = self._random.expovariate(1 / mean)
+
+        return max(latency_ms, 0.0) / 1000
+
+    async def _before_response(self):
+        """Apply latency and error injection shared by both response modes"""
+        latency = self.sample_latency()
+        if latency:
+            await asyncio.sleep(latency)
+
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise HTTPException(status_code=self.error_status, detail=self.error_bytes.decode())
+
+    async def respond(self, body: dict) -> bytes:
+        """
+        Serve a non-streaming response.
+
+        Args:
+            body: The parsed request body
+
+        Returns:
+            The pre-serialized response body
+
+        Raises:
+            HTTPException: If an error was injected for this request
+        """
+        await self._before_response()
+        return self.response_bytes
+
+    async def open_stream(self, body: dict) -> AsyncIterator[bytes]:
+        """
+        Serve a streaming response as server-sent events.
+
+        Latency and error injection happen before the stream is returned, so an
+        injected failure surfaces as a regular error response and not as a
+        truncated stream.
+
+        Args:
+            body: The parsed request body
+
+        Returns:
+            An async iterator over the encoded events
+
+        Raises:
+            HTTPException: If an error was injected for this request
+        """
+        await self._before_response()
+        return self._iter_stream_events()
+
+    async def _iter_stream_events(self) -> AsyncIterator[bytes]:
+        interval = self.stream_chunk_interval_ms / 1000
+        for i, event in enumerate(self.stream_events):
+            if interval and i:
+                await asyncio.sleep(interval)
+            yield event
+
+
+@lru_cache
+def get_mock_upstream() -> MockUpstream:
+    """Mock upstream for dev mode, with fixtures loaded once per worker"""
+    return MockUpstream.from_settings(get_settings())
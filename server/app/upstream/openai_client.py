@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+from fastapi import HTTPException
+import structlog
+
+from app.config import get_settings
+from app.serialization import dumps
+
+if TYPE_CHECKING:
+    from aiohttp import ClientSession
+
+logger = structlog.get_logger(__name__)
+
+OPENAI_API_BASE = "https://api.openai.com"
+
+
+class OpenAIClient:
+    """OpenAI API client that keeps one connection pool per worker"""
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = OPENAI_API_BASE,
+        max_connections: int = 100,
+        timeout_seconds: float = 120.0,
+    ):
+        """
+        Initialize the client. The connection pool is opened by `start()`.
+
+        Args:
+            api_key: OpenAI API key
+            base_url: OpenAI API base URL
+            max_connections: Size of the connection pool
+            timeout_seconds: Total timeout for a single upstream request
+        """
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.timeout_seconds = timeout_seconds
+        self._session: Optional[ClientSession] = None
+
+    @property
+    def session(self) -> Optional[ClientSession]:
+        return self._session
+
+    async def start(self):
+        """Open the connection pool"""
+        from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+        if self._session is None or self._session.closed:
+            self._session = ClientSession(
+                base_url=self.base_url,
+                connector=TCPConnector(limit=self.max_connections),
+                timeout=ClientTimeout(total=self.timeout_seconds),
+                headers={"Authorization": f"Bearer {self.api_key}"},
+            )
+
+    async def close(self):
+        """Close the connection pool"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def ping(self):
+        """
+        Check that the API is reachable and accepts the API key.
+
+        This also leaves an open connection in the pool, so the first proxied
+        request skips DNS and TLS setup.
+
+        Raises:
+            ConnectionError: If OpenAI returns a non-200 status
+        """
+        await self.start()
+        async with self._session.get("/v1/models") as resp:
+            if resp.status != 200:
+                raise ConnectionError(f"OpenAI returned {resp.status}")
+
+    def pool_usage(self) -> tuple[int, int]:
+        """Get (connections in use, pool size) of the connection pool"""
+        if self._session is None or self._session.closed:
+            return 0, self.max_connections
+        connector = self._session.connector
+        return len(getattr(connector, "_acquired", ())), connector.limit or self.max_connections
+
+    async def create_response(self, body: dict) -> bytes:
+        """
+        Call the /v1/responses endpoint.
+
+        Args:
+            body: The request body to forward
+
+        Returns:
+            The raw response body, to be forwarded without re-serializing it
+
+        Raises:
+            HTTPException: If OpenAI returns a non-200 status
+        """
+        await self.start()
+        async with self._session.post(
+            "/v1/responses",
+            data=dumps(body),
+            headers={"Content-Type": "application/json"},
+        ) as resp:
+            if resp.status != 200:
+                error_text = await resp.text()
+                logger.error("openai_request_failed", status=resp.status, error=error_text)
+
+                raise HTTPException(status_code=resp.status, detail=error_text)
+
+            return await resp.read()
+
+    async def open_stream(self, body: dict) -> tuple[AsyncIterator[bytes], str]:
+        """
+        Call the /v1/responses endpoint with `stream: true`.
+
+        The status is checked before the stream is returned, so an upstream
+        error surfaces as a regular error response and not as a truncated
+        stream. The total timeout does not apply to streams, which can run
+        longer; instead each read times out after `timeout_seconds`.
+
+        Args:
+            body: The request body to forward
+
+        Returns:
+            An async iterator over the raw response body, and its content type
+
+        Raises:
+            HTTPException: If OpenAI returns a non-200 status
+        """
+        from aiohttp import ClientTimeout
+
+        await self.start()
+        resp = await self._session.post(
+            "/v1/responses",
+            data=dumps(body),
+            headers={"Content-Type": "application/json"},
+            timeout=ClientTimeout(total=None, sock_connect=self.timeout_seconds, sock_read=self.timeout_seconds),
+        )
+        if resp.status != 200:
+            try:
+                error_text = await resp.text()
+            finally:
+                resp.release()
+            logger.error("openai_request_failed", status=resp.status, error=error_text)
+
+            raise HTTPException(status_code=resp.status, detail=error_text)
+
+        return self._iter_stream(resp), resp.headers.get("Content-Type", "text/event-stream")
+
+    async def _iter_stream(self, resp) -> AsyncIterator[bytes]:
+        # Closing the iterator early (client disconnect) also closes the upstream response
+        try:
+            async for chunk in resp.content.iter_any():
+                yield chunk
+        finally:
+            resp.release()
+
+
+@lru_cache
+def get_openai_client() -> OpenAIClient:
+    """OpenAI client with one connection pool per worker, opened during warmup"""
+    settings = get_settings()
+    return OpenAIClient(
+        api_key=settings.openai_api_key,
+        max_connections=settings.upstream_max_connections,
+        timeout_seconds=settings.upstream_timeout_seconds,
+    )
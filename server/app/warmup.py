@@ -0,0 +1,110 @@
+import time
+
+from fastapi import FastAPI
+import structlog
+
+from app.config import get_settings
+from app.cost.pricing_engine import MODEL_PRICING
+from app.cost.token_counter import count_tokens
+from app.health import get_health_monitor
+from app.middlewares.auth_middleware import pricing_engine
+from app.payment.quotas import get_payer_quotas
+from app.payment.x402 import close_facilitator, get_facilitator, import_sdks
+from app.state import get_shared_counters
+from app.tracing import setup_tracing, shutdown_tracing
+from app.upstream import get_mock_upstream, get_openai_client
+
+logger = structlog.get_logger(__name__)
+
+
+async def warm_tracing():
+    """Set up the tracer provider and exporter if tracing is enabled"""
+    setup_tracing()
+
+
+async def warm_pricing_tables():
+    """Resolve the rates of every priced model"""
+    for model in MODEL_PRICING:
+        pricing_engine.estimate_cost(model, 1, 1)
+
+
+async def warm_encoders():
+    """Load the tiktoken encodings (downloaded on first use, then cached)"""
+    for model in MODEL_PRICING:
+        count_tokens("warmup", model)
+
+
+async def warm_connection_pools():
+    """Open the upstream connection pool, or load the mock fixtures in dev mode"""
+    if get_settings().dev_mode:
+        get_mock_upstream()
+        await get_openai_client().start()
+    else:
+        await get_openai_client().ping()
+
+
+async def warm_facilitator():
+    """Import the payment SDKs and build the facilitator auth headers once (JWT signing for CDP)"""
+    import_sdks()
+    await get_facilitator().start()
+
+
+async def warm_shared_state():
+    """Connect the shared counters and payer spend counters and start syncing them"""
+    await get_shared_counters().start()
+    await get_payer_quotas().start()
+
+
+async def warm_dependency_probes():
+    """Probe the dependencies once and keep probing them in the background"""
+    from app.health.probes import register_probes
+
+    register_probes()
+    await get_health_monitor().start()
+
+
+WARMUP_STEPS = [
+    ("tracing", warm_tracing),
+    ("pricing_tables", warm_pricing_tables),
+    ("encoders", warm_encoders),
+    ("connection_pools", warm_connection_pools),
+    ("facilitator", warm_facilitator),
+    ("shared_state", warm_shared_state),
+    ("dependency_probes", warm_dependency_probes),
+]
+
+
+async def warmup(app: FastAPI):
+    """
+    Run every warmup step before the worker accepts traffic.
+
+    A failing step is logged and skipped so that a slow dependency does not
+    keep the worker from starting; the request path retries it lazily.
+    """
+    app.state.ready = False
+    started = time.perf_counter()
+
+    # Invalid configuration stops the worker instead of failing every request
+    get_settings()
+
+    for name, step in WARMUP_STEPS:
+        step_started = time.perf_counter()
+        try:
+            await step()
+            logger.info("warmup_step_completed", step=name, duration_seconds=time.perf_counter() - step_started)
+        except Exception as e:
+            logger.error("warmup_step_failed", step=name, error=str(e))
+
+    app.state.ready = True
+    logger.info("warmup_completed", duration_seconds=time.perf_counter() - started)
+
+
+async def shutdown(app: FastAPI):
+    """Release the resources opened during warmup"""
+    app.state.ready = False
+    await get_health_monitor().stop()
+    await get_shared_counters().stop()
+    await get_payer_quotas().stop()
+    await get_openai_client().close()
+    await close_facilitator()
+    shutdown_tracing()
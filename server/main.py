@@ -1,20 +1,34 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
 
-from app.config import settings
-from app.routes import health, openai
-from app.middlewares import logging_middleware, auth_middleware
+from app.config import get_settings
+from app.routes import batch, health, openai
+from app.middlewares import logging_middleware, auth_middleware, load_middleware, tracing_middleware
 from app.logging import setup_logging
 from app.payment.x402 import PaymentRequiredException
+from app.serialization import ORJSONResponse
+from app.warmup import shutdown, warmup
 
 # Setup logging first
 setup_logging()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up each worker before it accepts traffic"""
+    await warmup(app)
+    yield
+    await shutdown(app)
+
+
 app = FastAPI(
     title="x402 AI Gateway",
     description="Minimal OpenAI proxy with x402 cryptocurrency payments",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 @app.exception_handler(PaymentRequiredException)
@@ -29,7 +43,7 @@ async def payment_required_handler(request: Request, exc: PaymentRequiredExcepti
         "Access-Control-Allow-Credentials": "true",
     }
 
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=402,
         content=exc.error_data,
         headers=headers,
@@ -47,16 +61,24 @@ app.add_middleware(
 # Middleware (order matters!)
 app.middleware("http")(logging_middleware.structured_logging)
 app.middleware("http")(auth_middleware.verify_x402_payment)
+app.add_middleware(load_middleware.InFlightMiddleware)
+app.middleware("http")(tracing_middleware.trace_request)
 
 # Routes
 app.include_router(health.router, tags=["health"])
 app.include_router(openai.router, tags=["proxy"])
+app.include_router(batch.router, tags=["proxy"])
 
 if __name__ == "__main__":
     import uvicorn
+
+    settings = get_settings()
+
+    # Multiple workers need an import string so each process builds its own app
     uvicorn.run(
-        app,
+        "main:app" if settings.workers > 1 else app,
         host=settings.api_host,
         port=settings.api_port,
+        workers=settings.workers,
         log_config=None
     )
@@ -0,0 +1,116 @@
+"""
+Serialization microbenchmark for the gateway's per-request JSON work.
+
+Compares stdlib `json` with the orjson layer in `app.serialization` on the
+work a proxied request does: parsing the request body, forwarding the
+upstream response (parse and re-serialize, or pass the bytes through),
+reading the usage for the refund, and rendering a 402 body.
+
+Usage (from the `server` directory):
+    python scripts/bench_serialization.py [--number 2000] [--repeat 5]
+"""
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.serialization import dumps, loads  # noqa: E402
+from app.upstream.mock_upstream import DEFAULT_FIXTURE  # noqa: E402
+
+REQUEST_BODY = {
+    "model": "gpt-4o-mini",
+    "instructions": "You are a helpful assistant. " * 20,
+    "input": [
+        {"role": "user", "content": [{"type": "input_text", "text": "Summarize the following text. " * 50}]},
+    ],
+    "tools": [
+        {
+            "type": "function",
+            "name": "lookup",
+            "description": "Look up a record",
+            "parameters": {"type": "object", "properties": {"id": {"type": "string"}}, "required": ["id"]},
+        }
+    ],
+    "max_output_tokens": 500,
+}
+
+PAYMENT_REQUIRED_BODY = {
+    "x402Version": 1,
+    "error": "X-PAYMENT header is required",
+    "accepts": [
+        {
+            "scheme": "exact",
+            "network": "base",
+            "maxAmountRequired": "18042",
+            "resource": "http://localhost:8000/v1/responses",
+            "description": "Access OpenAI /responses endpoint",
+            "mimeType": "application/json",
+            "payTo": "0x0000000000000000000000000000000000000000",
+            "maxTimeoutSeconds": 60,
+            "asset": "0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913",
+            "extra": {"name": "USD Coin", "version": "2"},
+        }
+    ],
+}
+
+
+PAID_REQUEST_STEPS = ["parse request body", "forward upstream response", "read usage for refund"]
+
+
+def build_cases(request_bytes: bytes, response_bytes: bytes) -> dict:
+    """Per-request serialization steps, with the old (stdlib) and new (orjson) implementations"""
+    return {
+        "parse request body": {
+            "json": lambda: json.loads(request_bytes),
+            "orjson": lambda: loads(request_bytes),
+        },
+        "forward upstream response": {
+            "json": lambda: json.dumps(json.loads(response_bytes)).encode(),
+            "orjson": lambda: dumps(loads(response_bytes)),
+            "passthrough": lambda: response_bytes,
+        },
+        "read usage for refund": {
+            "json": lambda: json.loads(response_bytes.decode()).get("usage"),
+            "orjson": lambda: loads(response_bytes).get("usage"),
+        },
+        "render 402 body": {
+            "json": lambda: json.dumps(PAYMENT_REQUIRED_BODY).encode(),
+            "orjson": lambda: dumps(PAYMENT_REQUIRED_BODY),
+        },
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000, help="Calls per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs; the fastest one is reported")
+    parser.add_argument("--response", type=Path, default=DEFAULT_FIXTURE, help="Upstream response body to use")
+    args = parser.parse_args()
+
+    request_bytes = json.dumps(REQUEST_BODY).encode()
+    response_bytes = args.response.read_bytes()
+    print(f"request body: {len(request_bytes)} bytes, response body: {len(response_bytes)} bytes")
+
+    timings = {}
+    for case, implementations in build_cases(request_bytes, response_bytes).items():
+        print(case)
+        baseline = None
+        for name, func in implementations.items():
+            us = min(timeit.repeat(func, number=args.number, repeat=args.repeat)) / args.number * 1_000_000
+            baseline = baseline or us
+            timings[case, name] = us
+            print(f"  {name:<12} {us:8.2f} us  ({baseline / us:5.1f}x)")
+
+    # A paid request parses its body, forwards the response and reads its usage
+    before = sum(timings[case, "json"] for case in PAID_REQUEST_STEPS)
+    after = timings["parse request body", "orjson"] + timings["forward upstream response", "passthrough"]
+    after += timings["read usage for refund", "orjson"]
+    print(f"per paid request: {before:.1f} us with json, {after:.1f} us with orjson and passthrough")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
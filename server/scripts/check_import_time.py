@@ -0,0 +1,99 @@
+"""
+Import-time budget check for the gateway.
+
+Imports `main` in a fresh interpreter with `python -X importtime` and fails if
+the import takes longer than the budget, or if any of the heavy SDKs that
+should only load during the app warmup got imported.
+
+Usage (from the `server` directory):
+    python scripts/check_import_time.py [--budget-ms 1000] [--runs 3]
+"""
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parents[1]
+
+DEFAULT_BUDGET_MS = 1000.0
+
+# Loaded lazily, in the lifespan or on first use
+LAZY_MODULES = ["x402", "cdp", "eth_account", "tiktoken", "redis", "aiohttp", "opentelemetry.sdk"]
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def profile_import(module: str = "main") -> dict[str, int]:
+    """
+    Import a module in a fresh interpreter and collect cumulative import times.
+
+    Returns:
+        Dict of top-level-or-nested module name to cumulative microseconds
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SERVER_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            timings[match.group(4)] = int(match.group(2))
+    return timings
+
+
+def check(timings: dict[str, int], budget_ms: float = DEFAULT_BUDGET_MS) -> list[str]:
+    """
+    Check the import timings of `main` against the budget.
+
+    Returns:
+        A description of each failure, empty if the import is within budget
+    """
+    failures = []
+    import_ms = timings["main"] / 1000
+    if import_ms > budget_ms:
+        failures.append(f"`import main` took {import_ms:.0f} ms (budget {budget_ms:.0f} ms)")
+
+    eager = [
+        module for module in LAZY_MODULES
+        if any(name == module or name.startswith(f"{module}.") for name in timings)
+    ]
+    if eager:
+        failures.append(f"imported at startup instead of lazily: {', '.join(eager)}")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Maximum import time of `main`")
+    parser.add_argument("--runs", type=int, default=3, help="Imports to run; the fastest one is checked")
+    args = parser.parse_args()
+
+    runs = [profile_import() for _ in range(args.runs)]
+    fastest = min(runs, key=lambda timings: timings["main"])
+    import_ms = fastest["main"] / 1000
+
+    failures = check(fastest, args.budget_ms)
+
+    slowest = sorted(
+        ((name, us) for name, us in fastest.items() if name.startswith("app.")),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:5]
+    print(f"import main: {import_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    for name, us in slowest:
+        print(f"  {name}: {us / 1000:.0f} ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Required settings, so the app modules import without a .env file
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("X402_TESTNET_WALLET_ADDRESS", "0x" + "1" * 40)
+os.environ.setdefault("X402_MAINNET_WALLET_ADDRESS", "0x" + "1" * 40)
+
+
+class WhitespaceEncoding:
+    """Stand-in for a tiktoken encoding, one token per whitespace-separated word"""
+
+    def encode_ordinary(self, text: str) -> list[str]:
+        return text.split()
+
+    def encode(self, text: str) -> list[str]:
+        return text.split()
+
+
+@pytest.fixture(autouse=True)
+def whitespace_encoding(monkeypatch):
+    """Count tokens without downloading tiktoken's encodings"""
+    from app.cost import token_counter
+
+    monkeypatch.setattr(token_counter, "get_encoding", lambda model: WhitespaceEncoding())
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis.asyncio client, with the commands SharedCounters uses"""
+
+    def __init__(self):
+        self.store: dict[str, int] = {}
+        self.ttls: dict[str, int] = {}
+        self.gets = 0
+        self.script_calls = 0
+        self.fail_next_scripts = 0
+        self.lose_next_replies = 0
+
+    async def get(self, key: str):
+        self.gets += 1
+        value = self.store.get(key)
+        return None if value is None else str(value).encode()
+
+    def register_script(self, script: str):
+        """Runs SharedCounters' sync script, see SYNC_SCRIPT"""
+
+        async def run_sync_script(keys: list[str], args: list) -> list[int]:
+            self.script_calls += 1
+            if self.fail_next_scripts:
+                self.fail_next_scripts -= 1
+                raise ConnectionError("Timeout reading from Redis")
+
+            batch_key, counter_keys = keys[0], keys[1:]
+            apply = args[0] != 0 and batch_key not in self.store
+            if apply:
+                self.store[batch_key] = 1
+            values = []
+            for key, amount, ttl in zip(counter_keys, args[1::2], args[2::2]):
+                if apply and amount:
+                    self.store[key] = self.store.get(key, 0) + amount
+                    if ttl:
+                        self.ttls.setdefault(key, ttl)
+                values.append(self.store.get(key, 0))
+            if self.lose_next_replies:
+                # The script ran, but the reply never reached the client
+                self.lose_next_replies -= 1
+                raise TimeoutError("Timeout reading from Redis")
+            return values
+
+        return run_sync_script
+
+    async def ping(self):
+        return True
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture
+def fake_redis() -> FakeRedis:
+    return FakeRedis()
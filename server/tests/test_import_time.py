@@ -0,0 +1,30 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+SCRIPT = Path(__file__).resolve().parents[1] / "scripts" / "check_import_time.py"
+
+
+@pytest.fixture(scope="module")
+def check_import_time():
+    spec = importlib.util.spec_from_file_location("check_import_time", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_import_main_is_within_budget_and_lazy(check_import_time):
+    runs = [check_import_time.profile_import() for _ in range(3)]
+    fastest = min(runs, key=lambda timings: timings["main"])
+
+    assert check_import_time.check(fastest) == []
+
+
+def test_check_reports_eager_sdks_and_slow_imports(check_import_time):
+    timings = {"main": 2_000_000, "x402.facilitator": 500_000, "app.routes": 1_000}
+
+    failures = check_import_time.check(timings, budget_ms=1000)
+
+    assert len(failures) == 2
+    assert "x402" in failures[1]
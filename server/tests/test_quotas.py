@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from app.config import PayerPolicy
+from app.payment.quotas import PayerQuotas, QuotaExceededException
+from app.state import SharedCounters
+
+PAYER = "0xabc"
+NETWORK = "base"
+
+
+def make_quotas(**kwargs) -> PayerQuotas:
+    return PayerQuotas(SharedCounters(), **kwargs)
+
+
+@pytest.mark.parametrize("model", ["gpt-4o-mini", "gpt-4o-mini-2024-07-18", "gpt-3.5-turbo-0125"])
+def test_allowlist_accepts_listed_models_and_their_snapshots(model):
+    quotas = make_quotas(allowed_models=["gpt-4o-mini", "gpt-3.5-turbo"])
+
+    quotas.check(PAYER, [model], 1, NETWORK)
+
+
+@pytest.mark.parametrize("model", ["o3", "gpt-5", "gpt-4.1", "gpt-4o", "gpt-4o-2024-08-06"])
+def test_allowlist_rejects_unknown_and_unlisted_models(model):
+    quotas = make_quotas(allowed_models=["gpt-4o-mini", "gpt-3.5-turbo"])
+
+    with pytest.raises(QuotaExceededException) as exc_info:
+        quotas.check(PAYER, [model], 1, NETWORK)
+    assert exc_info.value.status_code == 403
+
+
+def test_allowlist_accepts_unknown_model_listed_by_exact_name():
+    quotas = make_quotas(allowed_models=["o3"])
+
+    quotas.check(PAYER, ["o3"], 1, NETWORK)
+
+
+def test_policy_overrides_default_allowlist():
+    quotas = make_quotas(allowed_models=["gpt-4o-mini"], policies={"0xABC": PayerPolicy(allowed_models=["gpt-4o"])})
+
+    quotas.check(PAYER, ["gpt-4o"], 1, NETWORK)
+    with pytest.raises(QuotaExceededException):
+        quotas.check("0xdef", ["gpt-4o"], 1, NETWORK)
+
+
+def shared_quotas(redis, **kwargs) -> PayerQuotas:
+    counters = SharedCounters(redis_url="redis://fake", max_idle_syncs=2)
+    counters._redis = redis
+    return PayerQuotas(counters, **kwargs)
+
+
+def test_reserve_and_release_spend():
+    quotas = make_quotas(daily_spend_limit_usd=1.0)
+
+    reservation = asyncio.run(quotas.reserve(PAYER, 600_000, NETWORK))
+    with pytest.raises(QuotaExceededException) as exc_info:
+        quotas.check(PAYER, ["gpt-4o-mini"], 600_000, NETWORK)
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.retry_after_seconds > 0
+
+    quotas.release(reservation)
+    quotas.check(PAYER, ["gpt-4o-mini"], 600_000, NETWORK)
+
+
+def test_reserve_without_caps_tracks_nothing():
+    quotas = make_quotas()
+
+    assert asyncio.run(quotas.reserve(PAYER, 600_000, NETWORK)) is None
+    assert quotas.counters.snapshot() == {}
+
+
+def test_check_does_not_track_unverified_payers(fake_redis):
+    quotas = shared_quotas(fake_redis, daily_spend_limit_usd=1.0)
+
+    quotas.check("0xforged", ["gpt-4o-mini"], 1, NETWORK)
+
+    assert quotas.counters.snapshot() == {}
+    assert fake_redis.gets == 0
+
+
+def daily_spend_key() -> str:
+    return f"x402-gateway:payer_spend:{PAYER}:{datetime.now(timezone.utc):%Y-%m-%d}"
+
+
+def test_reserve_enforces_spend_from_other_workers(fake_redis):
+    quotas = shared_quotas(fake_redis, daily_spend_limit_usd=1.0)
+    fake_redis.store[daily_spend_key()] = 900_000
+
+    with pytest.raises(QuotaExceededException):
+        asyncio.run(quotas.reserve(PAYER, 200_000, NETWORK))
+
+
+def test_cap_holds_after_an_idle_payer_is_forgotten(fake_redis):
+    quotas = shared_quotas(fake_redis, daily_spend_limit_usd=1.0)
+
+    async def spend_until_capped() -> int:
+        accepted = 0
+        for _ in range(20):
+            try:
+                await quotas.reserve(PAYER, 100_000, NETWORK)
+                accepted += 1
+            except QuotaExceededException:
+                break
+        await quotas.counters.sync()
+        # Go idle until the worker forgets the payer
+        for _ in range(4):
+            await quotas.counters.sync()
+        return accepted
+
+    assert asyncio.run(spend_until_capped()) == 10
+    assert quotas.counters.snapshot() == {}
+    assert asyncio.run(spend_until_capped()) == 0
+    assert fake_redis.store[daily_spend_key()] == 1_000_000
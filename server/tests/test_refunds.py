@@ -0,0 +1,32 @@
+from decimal import Decimal
+
+from app.cost.request_analyzer import UsageAnalysis, analyze_request
+from app.middlewares.auth_middleware import calculate_refund, estimate_cost, pricing_engine
+
+
+def test_refund_is_the_unused_part_of_the_escrow():
+    estimated_cost, analysis = estimate_cost({"model": "gpt-4o-mini", "input": "hi", "max_output_tokens": 100})
+    usage = UsageAnalysis(input_tokens=5, cached_input_tokens=0, output_tokens=10, reasoning_tokens=0)
+
+    refund = calculate_refund({0: usage}, estimated_cost, [analysis])
+
+    actual_cost = pricing_engine.calculate_actual_cost("gpt-4o-mini", 5, 10, 0)
+    assert refund == pricing_engine.calculate_refund(estimated_cost, actual_cost)
+    assert Decimal("0") < refund < estimated_cost
+
+
+def test_requests_without_usage_are_not_billed():
+    analyses = [analyze_request({"model": "gpt-4o-mini", "input": "hi", "max_output_tokens": 100})] * 2
+    estimated_cost = 2 * estimate_cost({"model": "gpt-4o-mini", "input": "hi", "max_output_tokens": 100})[0]
+    usage = UsageAnalysis(input_tokens=5, cached_input_tokens=0, output_tokens=10, reasoning_tokens=0)
+
+    refund = calculate_refund({0: usage}, estimated_cost, analyses)
+
+    actual_cost = pricing_engine.calculate_actual_cost("gpt-4o-mini", 5, 10, 0)
+    assert refund == pricing_engine.calculate_refund(estimated_cost, actual_cost)
+
+
+def test_failed_request_is_refunded_in_full():
+    estimated_cost, analysis = estimate_cost({"model": "gpt-4o", "input": "hi"})
+
+    assert calculate_refund({}, estimated_cost, [analysis]) == estimated_cost
@@ -0,0 +1,136 @@
+import pytest
+
+from app.cost.request_analyzer import MODEL_PROFILES, UsageAnalysis, analyze_batch, analyze_request, analyze_usage
+
+
+def test_counts_input_and_output_budget():
+    analysis = analyze_request({"model": "gpt-4o-mini", "input": "one two three", "max_output_tokens": 50})
+
+    assert analysis.pricing_model == "gpt-4o-mini"
+    # Message overhead, three words, reply priming
+    assert analysis.input_tokens == 3 + 3 + 3
+    assert analysis.max_output_tokens == 50
+    assert not analysis.output_tokens_capped
+
+
+def test_default_output_cap_applies_without_max_output_tokens():
+    analysis = analyze_request({"model": "o1-mini-2024-09-12", "input": "hi"})
+
+    assert analysis.pricing_model == "o1-mini"
+    assert analysis.max_output_tokens == MODEL_PROFILES["o1-mini"]["default_output_tokens"]
+    assert analysis.output_tokens_capped
+
+
+def test_max_output_tokens_is_clamped_to_the_model_limit():
+    analysis = analyze_request({"model": "gpt-4", "input": "hi", "max_output_tokens": 10**9})
+
+    assert analysis.max_output_tokens == MODEL_PROFILES["gpt-4"]["max_output_tokens"]
+
+
+def test_counts_instructions_tools_and_schema():
+    plain = analyze_request({"model": "gpt-4o", "input": "hi"})
+    full = analyze_request({
+        "model": "gpt-4o",
+        "instructions": "be brief",
+        "input": "hi",
+        "tools": [{"type": "function", "name": "lookup"}],
+        "text": {"format": {"type": "json_schema", "schema": {"type": "object"}}},
+    })
+
+    assert full.instructions_tokens > 0
+    assert full.tool_tokens > 0
+    assert full.input_tokens > plain.input_tokens + full.instructions_tokens + full.tool_tokens
+
+
+@pytest.mark.parametrize("detail, profile_key", [("low", "image_tokens_low"), ("high", "image_tokens_high"), (None, "image_tokens_high")])
+def test_images_are_priced_by_detail(detail, profile_key):
+    part = {"type": "input_image", "image_url": "https://example.com/a.png"}
+    if detail:
+        part["detail"] = detail
+    analysis = analyze_request({"model": "gpt-4o", "input": [{"role": "user", "content": [part]}]})
+
+    assert analysis.image_count == 1
+    assert analysis.image_tokens == MODEL_PROFILES["gpt-4o"][profile_key]
+
+
+def test_inline_file_is_sized_from_its_data():
+    file_data = "data:application/pdf;base64," + "A" * 4000
+    analysis = analyze_request({
+        "model": "gpt-4o",
+        "input": [{"role": "user", "content": [{"type": "input_file", "filename": "a.pdf", "file_data": file_data}]}],
+    })
+
+    assert analysis.referenced_file_count == 0
+    assert analysis.input_tokens >= 4000 * 3 // 4 // 4
+
+
+@pytest.mark.parametrize("file_part", [
+    {"type": "input_file", "file_id": "file-abc"},
+    {"type": "input_file", "file_url": "https://example.com/report.pdf"},
+])
+def test_referenced_file_is_escrowed_at_the_context_window(file_part):
+    analysis = analyze_request({
+        "model": "gpt-4o",
+        "input": [{"role": "user", "content": [file_part, {"type": "input_text", "text": "summarize"}]}],
+        "max_output_tokens": 1000,
+    })
+
+    assert analysis.referenced_file_count == 1
+    assert analysis.input_tokens == MODEL_PROFILES["gpt-4o"]["context_window"] - 1000
+
+
+@pytest.mark.parametrize("body", [
+    {"model": "gpt-4o", "input": "hi", "text": "hello"},
+    {"model": "gpt-4o", "input": "hi", "text": {"format": "json"}},
+    {"model": "gpt-4o", "input": "hi", "tools": {"type": "function"}},
+    {"model": 4, "input": "hi"},
+    ["gpt-4o", "hi"],
+])
+def test_malformed_request_raises_value_error(body):
+    with pytest.raises(ValueError):
+        analyze_request(body)
+
+
+def test_malformed_batch_item_names_its_index():
+    body = {"requests": [{"body": {"input": "hi"}}, {"body": {"input": "hi", "text": "hello"}}]}
+
+    with pytest.raises(ValueError, match=r"requests\[1\]: `text` must be an object"):
+        analyze_batch(body, max_requests=10)
+
+
+@pytest.mark.parametrize("body", [[1, 2], {"requests": []}, {"requests": [{"body": "hi"}]}])
+def test_malformed_batch_raises_value_error(body):
+    with pytest.raises(ValueError):
+        analyze_batch(body, max_requests=10)
+
+
+def test_usage_from_responses_api():
+    usage = analyze_usage({
+        "input_tokens": 100,
+        "input_tokens_details": {"cached_tokens": 40},
+        "output_tokens": 50,
+        "output_tokens_details": {"reasoning_tokens": 20},
+        "total_tokens": 150,
+    })
+
+    assert usage == UsageAnalysis(input_tokens=100, cached_input_tokens=40, output_tokens=50, reasoning_tokens=20)
+
+
+def test_usage_from_chat_completions():
+    usage = analyze_usage({
+        "prompt_tokens": 100,
+        "prompt_tokens_details": {"cached_tokens": 40},
+        "completion_tokens": 50,
+        "completion_tokens_details": {"reasoning_tokens": 20},
+    })
+
+    assert usage == UsageAnalysis(input_tokens=100, cached_input_tokens=40, output_tokens=50, reasoning_tokens=20)
+
+
+def test_usage_without_details():
+    assert analyze_usage({"input_tokens": 3, "output_tokens": None}) == UsageAnalysis(3, 0, 0, 0)
+
+
+@pytest.mark.parametrize("usage", [None, {}])
+def test_missing_usage(usage):
+    assert analyze_usage(usage) is None
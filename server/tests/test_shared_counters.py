@@ -0,0 +1,109 @@
+import asyncio
+
+from app.state import SharedCounters
+
+
+def shared_counters(redis, **kwargs) -> SharedCounters:
+    counters = SharedCounters(redis_url="redis://fake", namespace="test", **kwargs)
+    counters._redis = redis
+    return counters
+
+
+def test_local_counters_without_redis():
+    counters = SharedCounters()
+
+    counters.incr("requests")
+    counters.incr("requests", 2)
+    asyncio.run(counters.sync())
+
+    assert counters.get("requests") == 3
+    assert counters.snapshot() == {"requests": 3}
+
+
+def test_sync_pushes_increments_and_reads_back_totals(fake_redis):
+    counters = shared_counters(fake_redis)
+    fake_redis.store["test:requests"] = 10
+
+    counters.incr("requests", 2)
+    asyncio.run(counters.sync())
+
+    assert fake_redis.store["test:requests"] == 12
+    assert counters.get("requests") == 12
+
+
+def test_sync_sets_ttl_once(fake_redis):
+    counters = shared_counters(fake_redis)
+
+    counters.incr("spend", 5, ttl_seconds=60)
+    asyncio.run(counters.sync())
+    counters.incr("spend", 5, ttl_seconds=120)
+    asyncio.run(counters.sync())
+
+    assert fake_redis.ttls == {"test:spend": 60}
+
+
+def test_failed_sync_is_retried(fake_redis):
+    counters = shared_counters(fake_redis)
+    fake_redis.fail_next_scripts = 1
+
+    counters.incr("requests", 3)
+    asyncio.run(counters.sync())
+    assert "test:requests" not in fake_redis.store
+    assert counters.get("requests") == 3
+
+    asyncio.run(counters.sync())
+    assert fake_redis.store["test:requests"] == 3
+    assert counters.get("requests") == 3
+
+
+def test_retry_of_an_applied_sync_does_not_count_twice(fake_redis):
+    counters = shared_counters(fake_redis)
+    fake_redis.lose_next_replies = 2
+
+    async def run():
+        counters.incr("requests", 3)
+        await counters.sync()
+        counters.incr("requests", 1)
+        await counters.sync()
+        await counters.sync()
+        await counters.sync()
+
+    asyncio.run(run())
+
+    assert fake_redis.store["test:requests"] == 4
+    assert counters.get("requests") == 4
+
+
+def test_get_does_not_track_counters(fake_redis):
+    counters = shared_counters(fake_redis)
+
+    assert counters.get("unknown") == 0
+    asyncio.run(counters.sync())
+
+    assert counters.snapshot() == {}
+    assert fake_redis.script_calls == 0
+
+
+def test_idle_counters_are_forgotten(fake_redis):
+    counters = shared_counters(fake_redis, max_idle_syncs=2)
+
+    async def run():
+        counters.incr("spend", 5)
+        for _ in range(4):
+            await counters.sync()
+
+    asyncio.run(run())
+
+    assert counters.snapshot() == {}
+    assert fake_redis.store["test:spend"] == 5
+
+
+def test_track_seeds_counter_from_redis(fake_redis):
+    counters = shared_counters(fake_redis)
+    fake_redis.store["test:spend"] = 7
+
+    asyncio.run(counters.track("spend"))
+    asyncio.run(counters.track("spend"))
+
+    assert counters.get("spend") == 7
+    assert fake_redis.gets == 1